@@ -5,17 +5,48 @@ Demo mode for mailctl - Test with sample emails
 
 import sys
 import os
+import re
+import asyncio
+import concurrent.futures
 from datetime import datetime
 
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from rich.console import Console
-from src.ai_analyzer import AIAnalyzer
-from src.thread_analyzer import ThreadAnalyzer
-from src.task_manager import TaskManager
+# Rich and the analyzer modules (which pull in the Anthropic SDK) are imported
+# where they are first used, so importing this module stays cheap
+_console_instance = None
+
+
+def _console():
+    """Return the shared Rich console, creating it on first use."""
+    global _console_instance
+    if _console_instance is None:
+        from rich.console import Console
+        _console_instance = Console()
+    return _console_instance
+
+
+# Subjects that should become follow-up tasks; group 2 (urgent) means High priority
+_TASK_RE = re.compile(r'(budget)|(urgent)', re.IGNORECASE)
+
+# Shared analyzers, created on first use so importing this module stays cheap
+_ai_analyzer = None
+
+
+def get_ai_analyzer():
+    """Return the AIAnalyzer shared by all demos."""
+    global _ai_analyzer
+    if _ai_analyzer is None:
+        from src.ai_analyzer import AIAnalyzer
+        _ai_analyzer = AIAnalyzer()
+    return _ai_analyzer
+
+
+def get_thread_analyzer():
+    """Return the ThreadAnalyzer shared by all demos (the one owned by the AIAnalyzer)."""
+    return get_ai_analyzer().thread_analyzer
 
-console = Console()
 
 # Sample email data for testing
 SAMPLE_EMAILS = [
@@ -31,10 +62,10 @@ Please review the attached spreadsheet and let me know your thoughts by Friday.
 
 Thanks!
 Sarah''',
-        'headers': [
-            {'name': 'Message-ID', 'value': '<budget-thread-001@company.com>'},
-            {'name': 'Date', 'value': 'Mon, 15 Jan 2024 10:30:00 -0800'}
-        ],
+        'headers': {
+            'Message-ID': '<budget-thread-001@company.com>',
+            'Date': 'Mon, 15 Jan 2024 10:30:00 -0800'
+        },
         'provider': 'demo'
     },
     {
@@ -57,10 +88,10 @@ Please respond ASAP.
 Best regards,
 John Smith
 CTO, Important Client Inc.''',
-        'headers': [
-            {'name': 'Message-ID', 'value': '<bug-report-001@important-client.com>'},
-            {'name': 'Date', 'value': 'Mon, 15 Jan 2024 11:45:00 -0800'}
-        ],
+        'headers': {
+            'Message-ID': '<bug-report-001@important-client.com>',
+            'Date': 'Mon, 15 Jan 2024 11:45:00 -0800'
+        },
         'provider': 'demo'
     },
     {
@@ -83,11 +114,11 @@ CTO, Important Client Inc.''',
 
 Happy coding!
 Tech Blog Team''',
-        'headers': [
-            {'name': 'Message-ID', 'value': '<newsletter-123@techblog.com>'},
-            {'name': 'Date', 'value': 'Mon, 15 Jan 2024 09:00:00 -0800'},
-            {'name': 'List-Unsubscribe', 'value': '<mailto:unsubscribe@techblog.com>'}
-        ],
+        'headers': {
+            'Message-ID': '<newsletter-123@techblog.com>',
+            'Date': 'Mon, 15 Jan 2024 09:00:00 -0800',
+            'List-Unsubscribe': '<mailto:unsubscribe@techblog.com>'
+        },
         'provider': 'demo'
     },
     {
@@ -106,11 +137,11 @@ I'd like to schedule a quick meeting to discuss before I approve.
 
 Best,
 Manager''',
-        'headers': [
-            {'name': 'Message-ID', 'value': '<budget-thread-002@company.com>'},
-            {'name': 'In-Reply-To', 'value': '<budget-thread-001@company.com>'},
-            {'name': 'Date', 'value': 'Mon, 15 Jan 2024 12:15:00 -0800'}
-        ],
+        'headers': {
+            'Message-ID': '<budget-thread-002@company.com>',
+            'In-Reply-To': '<budget-thread-001@company.com>',
+            'Date': 'Mon, 15 Jan 2024 12:15:00 -0800'
+        },
         'provider': 'demo'
     },
     {
@@ -130,117 +161,169 @@ Shop now: https://shopping.com/sale
 Don't miss out on these incredible deals!
 
 Shopping Team''',
-        'headers': [
-            {'name': 'Message-ID', 'value': '<promo-456@shopping.com>'},
-            {'name': 'Date', 'value': 'Mon, 15 Jan 2024 08:30:00 -0800'},
-            {'name': 'List-Unsubscribe', 'value': '<https://shopping.com/unsubscribe>'}
-        ],
+        'headers': {
+            'Message-ID': '<promo-456@shopping.com>',
+            'Date': 'Mon, 15 Jan 2024 08:30:00 -0800',
+            'List-Unsubscribe': '<https://shopping.com/unsubscribe>'
+        },
         'provider': 'demo'
     }
 ]
 
+# Senders and providers repeat across emails; intern them so equal values share one object.
+# Bodies are encoded once up front for consumers that hash or scan bytes (the AI cache keys).
+for _email in SAMPLE_EMAILS:
+    _email['sender'] = sys.intern(_email['sender'])
+    _email['provider'] = sys.intern(_email['provider'])
+    _email['_body_utf8'] = _email['body'].encode('utf-8')
+
+# Column views of SAMPLE_EMAILS for passes that only need one or two fields
+SUBJECTS = [e['subject'] for e in SAMPLE_EMAILS]
+SENDERS = [e['sender'] for e in SAMPLE_EMAILS]
+
 
-def demo_ai_analysis():
+def demo_ai_analysis(thread_index=None, threads=None):
     """Demonstrate AI analysis capabilities"""
+    console = _console()
     console.print("[bold blue]🤖 AI Analysis Demo[/bold blue]\n")
 
-    ai_analyzer = AIAnalyzer()
+    from src.ai_analyzer import Analysis
 
-    for i, email in enumerate(SAMPLE_EMAILS, 1):
-        console.print(f"[bold]Email {i}: {email['subject']}[/bold]")
-        console.print(f"From: {email['sender']}")
+    ai_analyzer = get_ai_analyzer()
 
-        # Analyze with thread context
-        analysis = ai_analyzer.analyze_email_with_context(email, SAMPLE_EMAILS)
+    # Analyze all emails with thread context in a single batched request
+    results = ai_analyzer.analyze_emails_batch(
+        SAMPLE_EMAILS, SAMPLE_EMAILS, thread_index=thread_index, threads=threads
+    )
+
+    # Build the whole section and print it once rather than once per line
+    lines = []
+    for i, (email, analysis) in enumerate(zip(SAMPLE_EMAILS, results), 1):
+        lines.append(f"[bold]Email {i}: {email['subject']}[/bold]")
+        lines.append(f"From: {email['sender']}")
 
         if analysis:
-            console.print(f"Category: {analysis.get('category', 'Unknown')}")
-            console.print(f"Priority: {analysis.get('priority', 'Medium')}")
-            console.print(f"Summary: {analysis.get('summary', 'No summary')}")
-            console.print(f"Suggested Action: {analysis.get('suggested_action', 'NoAction')}")
+            analysis = Analysis.from_dict(analysis)
+            lines.append(f"Category: {analysis.category}")
+            lines.append(f"Priority: {analysis.priority}")
+            lines.append(f"Summary: {analysis.summary}")
+            lines.append(f"Suggested Action: {analysis.suggested_action}")
 
             # Show thread context if available
-            thread_context = analysis.get('thread_context')
+            thread_context = analysis.thread_context
             if thread_context:
-                console.print(f"Thread Length: {thread_context.get('thread_length', 1)} messages")
+                lines.append(f"Thread Length: {thread_context.get('thread_length', 1)} messages")
                 if thread_context.get('reply_recommended'):
-                    console.print(f"💬 Reply Recommended: {thread_context.get('suggested_reply_type', 'standard')}")
+                    lines.append(f"💬 Reply Recommended: {thread_context.get('suggested_reply_type', 'standard')}")
 
-        console.print()
+        lines.append("")
+
+    console.print("\n".join(lines))
 
 
-def demo_draft_generation():
+def demo_draft_generation(thread_index=None, threads=None):
     """Demonstrate draft generation"""
+    console = _console()
     console.print("[bold green]✍️ Draft Generation Demo[/bold green]\n")
 
-    ai_analyzer = AIAnalyzer()
+    ai_analyzer = get_ai_analyzer()
 
-    # Generate a draft for the urgent bug report
-    urgent_email = SAMPLE_EMAILS[1]  # The production bug email
-    console.print(f"[bold]Generating reply for: {urgent_email['subject']}[/bold]")
-
-    draft = ai_analyzer.generate_draft_reply(urgent_email, all_emails=SAMPLE_EMAILS)
-
-    if draft:
-        console.print(f"\n[bold]Generated Draft:[/bold]")
-        console.print(f"Subject: {draft.get('subject', '')}")
-        console.print(f"Confidence: {draft.get('confidence', 0)} / 1.0")
-        console.print(f"Requires Review: {draft.get('requires_review', True)}")
-        console.print(f"\nBody:\n{draft.get('body', '')}")
-    else:
-        console.print("[red]Could not generate draft (API key may be missing)[/red]")
+    # Generate drafts for the urgent emails (the production bug report)
+    urgent_emails = []
+    for email in SAMPLE_EMAILS:
+        match = _TASK_RE.search(email['subject'])
+        if match and match.group(2):
+            urgent_emails.append(email)
+
+    async def generate_all():
+        # One client for every draft of this run, opened on the run's own event loop
+        async with ai_analyzer.async_client() as client:
+            return await asyncio.gather(*(
+                ai_analyzer.agenerate_draft_reply(
+                    email, all_emails=SAMPLE_EMAILS, thread_index=thread_index, threads=threads,
+                    client=client
+                )
+                for email in urgent_emails
+            ))
+
+    # Requests are in flight together, so N drafts cost about one round-trip
+    drafts = asyncio.run(generate_all())
+
+    for urgent_email, draft in zip(urgent_emails, drafts):
+        console.print(f"[bold]Generating reply for: {urgent_email['subject']}[/bold]")
+
+        if draft:
+            console.print(f"\n[bold]Generated Draft:[/bold]")
+            console.print(f"Subject: {draft.get('subject', '')}")
+            console.print(f"Confidence: {draft.get('confidence', 0)} / 1.0")
+            console.print(f"Requires Review: {draft.get('requires_review', True)}")
+            console.print(f"\nBody:\n{draft.get('body', '')}")
+        else:
+            console.print("[red]Could not generate draft (API key may be missing)[/red]")
 
-    console.print()
+        console.print()
 
 
-def demo_thread_analysis():
+def demo_thread_analysis(threads=None):
     """Demonstrate thread analysis"""
+    console = _console()
     console.print("[bold yellow]🧵 Thread Analysis Demo[/bold yellow]\n")
 
-    thread_analyzer = ThreadAnalyzer()
+    thread_analyzer = get_thread_analyzer()
 
-    # Group emails by thread
-    threads = thread_analyzer.group_emails_by_thread(SAMPLE_EMAILS)
+    # Group emails by thread unless main() already did
+    if threads is None:
+        threads = thread_analyzer.group_emails_by_thread(SAMPLE_EMAILS)
 
-    console.print(f"Found {len(threads)} conversation threads:")
+    lines = [f"Found {len(threads)} conversation threads:"]
 
     for thread_id, thread_emails in threads.items():
-        console.print(f"\n[bold]Thread: {thread_id[:20]}...[/bold]")
-        console.print(f"Messages: {len(thread_emails)}")
+        lines.append(f"\n[bold]Thread: {thread_id[:20]}...[/bold]")
+        lines.append(f"Messages: {len(thread_emails)}")
 
         if len(thread_emails) > 1:
             # Analyze the thread
             thread_analysis = thread_analyzer.analyze_thread_patterns(thread_emails)
             summary = thread_analyzer.get_conversation_summary(thread_emails)
 
-            console.print(f"Summary: {summary}")
-            console.print(f"Participants: {', '.join(thread_analysis.get('participants', []))}")
+            lines.append(f"Summary: {summary}")
+            lines.append(f"Participants: {', '.join(thread_analysis.get('participants', []))}")
 
             # Check if replies are recommended
             for email in thread_emails:
                 reply_rec = thread_analyzer.should_draft_reply(email, thread_emails)
                 if reply_rec.get('should_reply'):
-                    console.print(f"💬 Reply recommended for: {email['subject'][:30]}...")
+                    lines.append(f"💬 Reply recommended for: {email['subject'][:30]}...")
+
+    console.print("\n".join(lines))
 
 
 def demo_task_management():
     """Demonstrate task management"""
+    console = _console()
     console.print("[bold magenta]📝 Task Management Demo[/bold magenta]\n")
 
+    from src.task_manager import TaskManager
+
     task_manager = TaskManager("demo_tasks.md")
 
-    # Create tasks from emails
-    for email in SAMPLE_EMAILS:
-        if 'budget' in email['subject'].lower() or 'urgent' in email['subject'].lower():
-            task_desc = f"Follow up on: {email['subject']}"
-            success = task_manager.create_task(
-                task_desc,
-                email['sender'],
-                email['subject'],
-                'High' if 'urgent' in email['subject'].lower() else 'Medium'
-            )
-            if success:
-                console.print(f"✓ Created task: {task_desc}")
+    # Create tasks from emails in a single write
+    pending = []
+    for idx, subject in enumerate(SUBJECTS):
+        match = _TASK_RE.search(subject)
+        if not match:
+            continue
+
+        pending.append({
+            'task_description': f"Follow up on: {subject}",
+            'sender': SENDERS[idx],
+            'email_subject': subject,
+            'priority': 'High' if match.group(2) else 'Medium'
+        })
+
+    for task, success in zip(pending, task_manager.create_tasks_bulk(pending)):
+        if success:
+            console.print(f"✓ Created task: {task['task_description']}")
 
     # Show created tasks
     tasks = task_manager.get_tasks()
@@ -253,16 +336,43 @@ def demo_task_management():
         console.print("No tasks found in demo_tasks.md")
 
 
+def _run_captured(demo, **kwargs) -> str:
+    """Run a demo section and return its rendered output instead of printing it.
+
+    Rich keeps capture buffers per thread, so sections running concurrently
+    do not interleave their lines.
+    """
+    with _console().capture() as capture:
+        demo(**kwargs)
+    return capture.get()
+
+
 def main():
     """Run all demos"""
+    console = _console()
     console.print("[bold]🚀 mailctl Demo Mode[/bold]")
     console.print("Testing all features with sample emails\n")
 
     try:
-        demo_ai_analysis()
-        demo_thread_analysis()
-        demo_draft_generation()
-        demo_task_management()
+        # Group threads once and share the index with every demo
+        thread_index, threads = get_thread_analyzer().build_thread_index(SAMPLE_EMAILS)
+
+        sections = [
+            (demo_ai_analysis, {'thread_index': thread_index, 'threads': threads}),
+            (demo_thread_analysis, {'threads': threads}),
+            (demo_draft_generation, {'thread_index': thread_index, 'threads': threads}),
+            (demo_task_management, {}),
+        ]
+
+        # Sections are independent and mostly wait on the API, so run them
+        # concurrently and print each one's output in order as it finishes
+        from rich.text import Text
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(sections)) as executor:
+            futures = [executor.submit(_run_captured, demo, **kwargs) for demo, kwargs in sections]
+            for future in futures:
+                # from_ansi drops the capture's final newline, so let print add it back
+                console.print(Text.from_ansi(future.result()))
 
         console.print("[bold green]✅ All demos completed successfully![/bold green]")
         console.print("\nTo run the full application:")
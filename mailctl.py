@@ -48,17 +48,41 @@ OUTLOOK SETUP:
    python mailctl.py
 """
 
+import atexit
 import json
 import os
 import base64
+import concurrent.futures
+import functools
+import hashlib
 import re
+import sys
+import threading
+import time
 import urllib.parse
+from collections import deque
 from typing import Dict, List, Optional, Any
 from email.mime.text import MIMEText
 
+# orjson parses API and model responses several times faster; stdlib json is the fallback
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+try:
+    import termios
+    import tty
+except ImportError:  # Windows: no termios, fall back to line input
+    termios = None
+
 import anthropic
+import httpx
 import msal
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -74,9 +98,93 @@ from rich.text import Text
 load_dotenv()
 
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
+# Partial-response projection for messages.get: headers and text parts (three MIME levels
+# deep) without the rest of the payload metadata
+GMAIL_MESSAGE_FIELDS = (
+    'id,payload(headers,mimeType,body/data,'
+    'parts(mimeType,body/data,parts(mimeType,body/data,parts(mimeType,body/data))))'
+)
 OUTLOOK_SCOPES = ['https://graph.microsoft.com/Mail.ReadWrite', 'https://graph.microsoft.com/Mail.Send']
 console = Console()
 
+# List-Unsubscribe header targets
+_MAILTO_RE = re.compile(r'<mailto:([^>]+)>')
+_HTTP_RE = re.compile(r'<(https?://[^>]+)>')
+
+# Wording that marks a message as possibly important even when it was sent as bulk
+# mail (e.g. bank or security alerts from an ESP), so it is never header-classified
+_ALERT_RE = re.compile(
+    r'urgent|security|alert|password|sign-?in|verif|suspicious|fraud|account|'
+    r'payment|invoice|action required',
+    re.IGNORECASE
+)
+
+# MSAL tokens persist here between runs so warm starts can skip the sign-in round-trip
+MSAL_CACHE_PATH = os.path.expanduser('~/.mailctl/msal_cache.bin')
+
+# One pooled, retrying session for every Microsoft Graph call so connections are
+# kept alive across messages; outlook_authenticate() sets its Authorization header
+_graph_session = requests.Session()
+_graph_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+_graph_session.headers.update({'Accept': 'application/json'})
+
+MODEL = "claude-3-5-sonnet-20241022"
+
+ANALYSIS_FORMAT = """{
+          "summary": "A concise one-sentence summary of the email's content.",
+          "category": "Choose one: Important, Newsletter, Promotion, Transactional, Spam, TaskRequest",
+          "suggested_action": "Choose one: Reply, Delete, Unsubscribe, CreateTask, NoAction",
+          "task_description": "If the email contains a task, describe the task here. Otherwise, null."
+        }"""
+
+# Tasks created during a session are buffered and written together
+TASKS_FILE = 'tasks.md'
+_task_buffer: List[str] = []
+
+# Emails sent to Claude per analysis request
+AI_BATCH_SIZE = 5
+
+# Claude analyses are cached on disk by content hash so reruns over the same
+# unread mail do not re-spend tokens; entries expire after a week
+AI_CACHE_PATH = os.path.expanduser('~/.mailctl/ai_cache.json')
+AI_CACHE_TTL = 7 * 86400
+_ai_cache = None
+_ai_cache_lock = threading.Lock()
+
+# How many emails are analyzed with Claude at once; bounded to respect API rate limits
+AI_MAX_WORKERS = int(os.getenv('MAILCTL_AI_WORKERS', '5'))
+
+# Ask Graph to convert HTML bodies to plain text server-side (message GETs only)
+GRAPH_TEXT_HEADERS = {'Prefer': 'outlook.body-content-type="text"'}
+
+GRAPH_BATCH_URL = 'https://graph.microsoft.com/v1.0/$batch'
+GRAPH_BATCH_LIMIT = 20  # Graph accepts at most 20 subrequests per $batch call
+
+def _load_msal_cache() -> msal.SerializableTokenCache:
+    """Load the persisted MSAL token cache and save it back on exit if it changes."""
+    cache = msal.SerializableTokenCache()
+    if os.path.exists(MSAL_CACHE_PATH):
+        try:
+            with open(MSAL_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cache.deserialize(f.read())
+        except Exception as error:
+            console.print(f"[yellow]Ignoring unreadable token cache: {error}[/yellow]")
+    
+    def save():
+        if cache.has_state_changed:
+            os.makedirs(os.path.dirname(MSAL_CACHE_PATH), exist_ok=True)
+            # Tokens are credentials: create the file readable by the owner only
+            fd = os.open(MSAL_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(cache.serialize())
+    
+    atexit.register(save)
+    return cache
+
 def outlook_authenticate() -> Optional[str]:
     """Authenticate with Microsoft Graph API using MSAL."""
     client_id = os.getenv('OUTLOOK_CLIENT_ID')
@@ -89,7 +197,8 @@ def outlook_authenticate() -> Optional[str]:
     
     app = msal.PublicClientApplication(
         client_id=client_id,
-        authority=authority
+        authority=authority,
+        token_cache=_load_msal_cache()
     )
     
     # Try to get token from cache
@@ -97,6 +206,7 @@ def outlook_authenticate() -> Optional[str]:
     if accounts:
         result = app.acquire_token_silent(OUTLOOK_SCOPES, account=accounts[0])
         if result and 'access_token' in result:
+            _graph_session.headers['Authorization'] = f"Bearer {result['access_token']}"
             return result['access_token']
     
     # Interactive authentication
@@ -106,6 +216,7 @@ def outlook_authenticate() -> Optional[str]:
     )
     
     if 'access_token' in result:
+        _graph_session.headers['Authorization'] = f"Bearer {result['access_token']}"
         return result['access_token']
     else:
         console.print(f"[red]Authentication failed: {result.get('error_description', 'Unknown error')}[/red]")
@@ -141,20 +252,20 @@ def gmail_authenticate() -> Any:
         console.print(f"[red]An error occurred during authentication: {error}[/red]")
         return None
 
+def _check_status(response: requests.Response):
+    """Raise HTTPError for a 4xx/5xx Graph response; a plain status check on the hot path."""
+    if response.status_code >= 400:
+        raise requests.HTTPError(f"{response.status_code} Error for url: {response.url}", response=response)
+
 def fetch_unread_outlook_emails(access_token: str, count: int = 10) -> List[Dict]:
     """Fetch unread emails from Outlook using Microsoft Graph API."""
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
     url = f'https://graph.microsoft.com/v1.0/me/messages?$filter=isRead eq false&$top={count}&$select=id,sender,subject,body,internetMessageHeaders'
     
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        response = _graph_session.get(url, headers=GRAPH_TEXT_HEADERS)
+        _check_status(response)
         
-        data = response.json()
+        data = _loads(response.content)
         emails = []
         
         for message in data.get('value', []):
@@ -163,13 +274,14 @@ def fetch_unread_outlook_emails(access_token: str, count: int = 10) -> List[Dict
                 'sender': message['sender']['emailAddress']['address'],
                 'subject': message.get('subject', 'No Subject'),
                 'body': message['body']['content'][:2000] if message['body']['content'] else '',
-                'headers': message.get('internetMessageHeaders', [])
+                'headers': message.get('internetMessageHeaders', []),
+                'header_map': _header_map(message.get('internetMessageHeaders', []))
             }
             emails.append(email_data)
         
         return emails
     
-    except requests.RequestException as error:
+    except (requests.RequestException, ValueError) as error:
         console.print(f"[red]Error fetching Outlook emails: {error}[/red]")
         return []
 
@@ -179,7 +291,8 @@ def fetch_unread_emails(service: Any, count: int = 10) -> List[str]:
         results = service.users().messages().list(
             userId='me',
             q='is:unread',
-            maxResults=count
+            maxResults=count,
+            fields='messages/id'
         ).execute()
         
         messages = results.get('messages', [])
@@ -191,28 +304,24 @@ def fetch_unread_emails(service: Any, count: int = 10) -> List[str]:
 
 def get_outlook_email_details(access_token: str, message_id: str) -> Optional[Dict[str, str]]:
     """Get detailed information about a specific Outlook email."""
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
     url = f'https://graph.microsoft.com/v1.0/me/messages/{message_id}?$select=id,sender,subject,body,internetMessageHeaders'
     
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        response = _graph_session.get(url, headers=GRAPH_TEXT_HEADERS)
+        _check_status(response)
         
-        message = response.json()
+        message = _loads(response.content)
         
         return {
             'id': message_id,
             'sender': message['sender']['emailAddress']['address'],
             'subject': message.get('subject', 'No Subject'),
             'body': message['body']['content'][:2000] if message['body']['content'] else '',
-            'headers': message.get('internetMessageHeaders', [])
+            'headers': message.get('internetMessageHeaders', []),
+            'header_map': _header_map(message.get('internetMessageHeaders', []))
         }
     
-    except requests.RequestException as error:
+    except (requests.RequestException, ValueError) as error:
         console.print(f"[red]Error fetching Outlook email details: {error}[/red]")
         return None
 
@@ -222,47 +331,178 @@ def get_email_details(service: Any, message_id: str) -> Optional[Dict[str, str]]
         message = service.users().messages().get(
             userId='me',
             id=message_id,
-            format='full'
+            format='full',
+            fields=GMAIL_MESSAGE_FIELDS
         ).execute()
         
-        headers = message['payload'].get('headers', [])
-        
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-        
-        body = extract_email_body(message['payload'])
-        
-        return {
-            'id': message_id,
-            'sender': sender,
-            'subject': subject,
-            'body': body,
-            'headers': headers
-        }
+        return _parse_gmail_message(message_id, message)
     
     except HttpError as error:
         console.print(f"[red]Error fetching email details: {error}[/red]")
         return None
 
+def get_email_details_batch(service: Any, message_ids: List[str]) -> List[Dict[str, str]]:
+    """Get details for several emails in one batched Gmail request, in input order."""
+    details = {}
+    
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            console.print(f"[red]Error fetching email details: {exception}[/red]")
+            return
+        details[request_id] = _parse_gmail_message(request_id, response)
+    
+    # Gmail accepts at most 100 calls per batch request
+    for start in range(0, len(message_ids), 100):
+        batch = service.new_batch_http_request(callback=on_response)
+        for message_id in message_ids[start:start + 100]:
+            batch.add(
+                service.users().messages().get(
+                    userId='me', id=message_id, format='full', fields=GMAIL_MESSAGE_FIELDS
+                ),
+                request_id=message_id
+            )
+        try:
+            batch.execute()
+        except HttpError as error:
+            console.print(f"[red]Error fetching email details: {error}[/red]")
+    
+    return [details[message_id] for message_id in message_ids if message_id in details]
+
+def _parse_gmail_message(message_id: str, message: Dict) -> Dict[str, str]:
+    """Build the email details dict from a Gmail messages.get response."""
+    headers = message['payload'].get('headers', [])
+    header_map = _header_map(headers)
+    
+    body = extract_email_body(message['payload'])
+    
+    return {
+        'id': message_id,
+        'sender': header_map.get('from', 'Unknown'),
+        'subject': header_map.get('subject', 'No Subject'),
+        'body': body,
+        'headers': headers,
+        'header_map': header_map
+    }
+
+def _header_map(headers: List[Dict]) -> Dict[str, str]:
+    """Index a list of {'name', 'value'} headers by lowercased name (first occurrence wins)."""
+    header_map = {}
+    for header in headers:
+        header_map.setdefault(header.get('name', '').lower(), header.get('value', ''))
+    return header_map
+
 def extract_email_body(payload: Dict) -> str:
     """Extract plain text body from email payload."""
-    body = ""
-    
-    if 'parts' in payload:
-        for part in payload['parts']:
-            if part['mimeType'] == 'text/plain':
-                data = part['body']['data']
-                body = base64.urlsafe_b64decode(data).decode('utf-8')
-                break
-            elif part['mimeType'] == 'multipart/alternative':
-                body = extract_email_body(part)
-                if body:
-                    break
-    elif payload['mimeType'] == 'text/plain':
-        data = payload['body']['data']
-        body = base64.urlsafe_b64decode(data).decode('utf-8')
-    
-    return body[:2000]  # Limit body length for AI processing
+    # Breadth-first walk of the MIME tree; only the first text/plain part is decoded
+    queue = deque([payload])
+    while queue:
+        part = queue.popleft()
+        data = part.get('body', {}).get('data')
+        if part.get('mimeType') == 'text/plain' and data:
+            body = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+            return body[:2000]  # Limit body length for AI processing
+        queue.extend(part.get('parts', []))
+    
+    return ""
+
+def _ai_cache_key(sender: str, subject: str, body: str) -> str:
+    """Hash the model and the exact prompt inputs into a cache key."""
+    return hashlib.sha256(f"{MODEL}|{sender}|{subject}|{body[:1500]}".encode('utf-8')).hexdigest()
+
+def _load_ai_cache() -> Dict[str, Dict]:
+    """Load the AI cache from disk on first use (caller holds _ai_cache_lock)."""
+    global _ai_cache
+    if _ai_cache is None:
+        _ai_cache = {}
+        try:
+            with open(AI_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cutoff = time.time() - AI_CACHE_TTL
+                _ai_cache = {k: v for k, v in json.load(f).items() if v.get('created', 0) > cutoff}
+        except (OSError, ValueError, AttributeError):
+            pass  # Missing or corrupt cache: start empty
+    return _ai_cache
+
+def _ai_cache_get(key: str) -> Optional[Dict]:
+    """Return a cached, unexpired analysis for key, if any."""
+    with _ai_cache_lock:
+        entry = _load_ai_cache().get(key)
+    if entry and entry['created'] > time.time() - AI_CACHE_TTL:
+        return dict(entry['analysis'])
+    return None
+
+def _ai_cache_put(key: str, analysis: Dict):
+    """Store an analysis; the cache file is rewritten once at exit."""
+    with _ai_cache_lock:
+        _load_ai_cache()[key] = {'created': time.time(), 'analysis': analysis}
+
+def _save_ai_cache():
+    """Write the AI cache back to disk if it was loaded this run."""
+    with _ai_cache_lock:
+        if _ai_cache is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(AI_CACHE_PATH), exist_ok=True)
+            tmp_path = AI_CACHE_PATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_ai_cache, f)
+            os.replace(tmp_path, AI_CACHE_PATH)
+        except OSError as error:
+            console.print(f"[yellow]Could not save AI cache: {error}[/yellow]")
+
+atexit.register(_save_ai_cache)
+
+_json_decoder = json.JSONDecoder()
+
+def _extract_json(response_text: str, opener: str) -> Any:
+    """Parse the first JSON value starting with opener ('{' or '[') in a model response."""
+    json_start = response_text.find(opener)
+    if json_start == -1:
+        return _loads(response_text)
+    if json_start == 0 and response_text.endswith('}' if opener == '{' else ']'):
+        # Usual case: the response is nothing but the JSON value
+        try:
+            return _loads(response_text)
+        except ValueError:
+            pass
+    try:
+        # raw_decode stops at the end of the value, so trailing prose or stray
+        # braces after it do not matter
+        value, _ = _json_decoder.raw_decode(response_text, json_start)
+        return value
+    except json.JSONDecodeError:
+        closer = '}' if opener == '{' else ']'
+        return _loads(response_text[json_start:response_text.rfind(closer) + 1])
+
+@functools.lru_cache(maxsize=1)
+def _anthropic_client(api_key: str) -> anthropic.Anthropic:
+    """Return one shared Anthropic client so its connection pool is reused across emails."""
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    except ImportError:
+        return anthropic.Anthropic(api_key=api_key)
+    
+    # Multiplex the concurrent prefetch requests over one HTTP/2 connection
+    http_client = httpx.Client(
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+    )
+    return anthropic.Anthropic(api_key=api_key, http_client=http_client)
+
+def _quick_classify(email: Dict) -> Optional[Dict]:
+    """Classify obvious bulk mail from its headers; None means ask Claude."""
+    header_map = email.get('header_map') or _header_map(email.get('headers', []))
+    if 'list-unsubscribe' not in header_map and header_map.get('precedence', '').lower() != 'bulk':
+        return None
+    # Alerts and notices are often sent through the same mailers; leave those to Claude
+    if _ALERT_RE.search(email.get('subject', '')) or _ALERT_RE.search(email.get('body', '')):
+        return None
+    return {
+        "summary": f"Bulk mail from {email['sender']}",
+        "category": "Newsletter",
+        "suggested_action": "Unsubscribe",
+        "task_description": None
+    }
 
 def analyze_email_with_ai(sender: str, subject: str, body: str) -> Optional[Dict]:
     """Analyze email content using Claude AI."""
@@ -271,18 +511,18 @@ def analyze_email_with_ai(sender: str, subject: str, body: str) -> Optional[Dict
         console.print("[red]Error: ANTHROPIC_API_KEY not found in environment![/red]")
         return None
     
+    cache_key = _ai_cache_key(sender, subject, body)
+    cached = _ai_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        client = anthropic.Anthropic(api_key=api_key)
+        client = _anthropic_client(api_key)
         
         prompt = f"""
         Analyze this email and return a JSON object with the following structure:
 
-        {{
-          "summary": "A concise one-sentence summary of the email's content.",
-          "category": "Choose one: Important, Newsletter, Promotion, Transactional, Spam, TaskRequest",
-          "suggested_action": "Choose one: Reply, Delete, Unsubscribe, CreateTask, NoAction",
-          "task_description": "If the email contains a task, describe the task here. Otherwise, null."
-        }}
+        {ANALYSIS_FORMAT}
 
         Email Details:
         From: {sender}
@@ -293,20 +533,18 @@ def analyze_email_with_ai(sender: str, subject: str, body: str) -> Optional[Dict
         """
         
         message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
+            model=MODEL,
             max_tokens=1000,
+            temperature=0,  # Deterministic output keeps cached results representative
             messages=[{"role": "user", "content": prompt}]
         )
         
         response_text = message.content[0].text.strip()
         
-        json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
-        if json_start != -1 and json_end != 0:
-            json_text = response_text[json_start:json_end]
-            return json.loads(json_text)
-        else:
-            return json.loads(response_text)
+        analysis = _extract_json(response_text, '{')
+        
+        _ai_cache_put(cache_key, analysis)
+        return analysis
     
     except Exception as error:
         console.print(f"[red]Error analyzing email with AI: {error}[/red]")
@@ -317,23 +555,105 @@ def analyze_email_with_ai(sender: str, subject: str, body: str) -> Optional[Dict
             "task_description": None
         }
 
+def analyze_emails_with_ai_batch(emails: List[Dict]) -> List[Optional[Dict]]:
+    """Analyze several emails with a single Claude request; results are in input order."""
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        console.print("[red]Error: ANTHROPIC_API_KEY not found in environment![/red]")
+        return [None] * len(emails)
+    
+    cache_keys = [_ai_cache_key(e['sender'], e['subject'], e['body']) for e in emails]
+    results = [_ai_cache_get(key) for key in cache_keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    
+    if pending:
+        try:
+            client = _anthropic_client(api_key)
+            
+            email_blocks = "\n\n".join(
+                f"[{n}] From: {emails[i]['sender']}\n"
+                f"Subject: {emails[i]['subject']}\n"
+                f"Body: {emails[i]['body'][:1500]}"
+                for n, i in enumerate(pending, 1)
+            )
+            
+            prompt = f"""
+        Analyze each of the following emails. Return a JSON array with exactly one
+        object per email, in the same order, each with the following structure:
+
+        {ANALYSIS_FORMAT}
+
+        Emails:
+{email_blocks}
+
+        Return only the JSON array, no additional text.
+        """
+            
+            message = client.messages.create(
+                model=MODEL,
+                max_tokens=min(1000 * len(pending), 8000),
+                temperature=0,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            
+            response_text = message.content[0].text.strip()
+            analyses = _extract_json(response_text, '[')
+            
+            for i, analysis in zip(pending, analyses):
+                if isinstance(analysis, dict):
+                    results[i] = analysis
+                    _ai_cache_put(cache_keys[i], analysis)
+        
+        except Exception as error:
+            console.print(f"[red]Error analyzing emails with AI: {error}[/red]")
+    
+    # Anything the batch response did not cover gets its own request
+    for i, result in enumerate(results):
+        if result is None:
+            results[i] = analyze_email_with_ai(emails[i]['sender'], emails[i]['subject'], emails[i]['body'])
+    
+    return results
+
 def delete_outlook_email(access_token: str, message_id: str) -> bool:
     """Move Outlook email to trash."""
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
     url = f'https://graph.microsoft.com/v1.0/me/messages/{message_id}'
     
     try:
-        response = requests.delete(url, headers=headers)
-        response.raise_for_status()
+        response = _graph_session.delete(url)
+        _check_status(response)
         return True
     except requests.RequestException as error:
         console.print(f"[red]Error deleting Outlook email: {error}[/red]")
         return False
 
+def graph_batch(session: requests.Session, requests_list: List[Dict]) -> Dict[str, int]:
+    """Send up to 20 Graph subrequests in one $batch call and return each one's status by id."""
+    try:
+        response = session.post(GRAPH_BATCH_URL, json={'requests': requests_list})
+        _check_status(response)
+        return {r['id']: r.get('status', 0) for r in _loads(response.content).get('responses', [])}
+    except (requests.RequestException, ValueError) as error:
+        console.print(f"[red]Error sending Graph batch request: {error}[/red]")
+        return {}
+
+def flush_outlook_deletes(pending: List[Dict]):
+    """Delete the queued Outlook emails with one $batch call and report each result."""
+    if not pending:
+        return
+    
+    statuses = graph_batch(_graph_session, [
+        {'id': str(n), 'method': 'DELETE', 'url': f"/me/messages/{email['id']}"}
+        for n, email in enumerate(pending)
+    ])
+    
+    for n, email in enumerate(pending):
+        if 200 <= statuses.get(str(n), 0) < 300:
+            console.print(f"[green]✓ Email deleted: {email['subject']}[/green]")
+        else:
+            console.print(f"[red]✗ Failed to delete email: {email['subject']}[/red]")
+    
+    pending.clear()
+
 def delete_email(service: Any, message_id: str) -> bool:
     """Move email to trash."""
     try:
@@ -345,17 +665,13 @@ def delete_email(service: Any, message_id: str) -> bool:
 
 def unsubscribe_from_outlook_email(access_token: str, message_id: str, headers: List[Dict]) -> bool:
     """Attempt to unsubscribe from Outlook email using List-Unsubscribe header."""
-    unsubscribe_header = None
-    for header in headers:
-        if header.get('name', '').lower() == 'list-unsubscribe':
-            unsubscribe_header = header.get('value')
-            break
+    unsubscribe_header = _header_map(headers).get('list-unsubscribe')
     
     if not unsubscribe_header:
         console.print("[yellow]No unsubscribe header found in this email[/yellow]")
         return False
     
-    mailto_match = re.search(r'<mailto:([^>]+)>', unsubscribe_header)
+    mailto_match = _MAILTO_RE.search(unsubscribe_header)
     if mailto_match:
         unsubscribe_email = mailto_match.group(1)
         
@@ -377,25 +693,20 @@ def unsubscribe_from_outlook_email(access_token: str, message_id: str, headers:
             }
         }
         
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
         try:
-            response = requests.post(
+            # json= sets Content-Type: application/json for the POST body
+            response = _graph_session.post(
                 'https://graph.microsoft.com/v1.0/me/sendMail',
-                headers=headers,
                 json=email_data
             )
-            response.raise_for_status()
+            _check_status(response)
             console.print(f"[green]Unsubscribe email sent to: {unsubscribe_email}[/green]")
             return True
         except requests.RequestException as error:
             console.print(f"[red]Error sending unsubscribe email: {error}[/red]")
             return False
     
-    http_match = re.search(r'<(https?://[^>]+)>', unsubscribe_header)
+    http_match = _HTTP_RE.search(unsubscribe_header)
     if http_match:
         unsubscribe_url = http_match.group(1)
         console.print(f"[yellow]Unsubscribe link (manual action required): {unsubscribe_url}[/yellow]")
@@ -404,26 +715,16 @@ def unsubscribe_from_outlook_email(access_token: str, message_id: str, headers:
     console.print("[yellow]Could not parse unsubscribe header[/yellow]")
     return False
 
-def unsubscribe_from_email(service: Any, message_id: str) -> bool:
+def unsubscribe_from_email(service: Any, message_id: str, headers: List[Dict]) -> bool:
     """Attempt to unsubscribe from email using List-Unsubscribe header."""
     try:
-        message = service.users().messages().get(
-            userId='me',
-            id=message_id,
-            format='full'
-        ).execute()
-        
-        headers = message['payload'].get('headers', [])
-        unsubscribe_header = next(
-            (h['value'] for h in headers if h['name'] == 'List-Unsubscribe'), 
-            None
-        )
+        unsubscribe_header = _header_map(headers).get('list-unsubscribe')
         
         if not unsubscribe_header:
             console.print("[yellow]No unsubscribe header found in this email[/yellow]")
             return False
         
-        mailto_match = re.search(r'<mailto:([^>]+)>', unsubscribe_header)
+        mailto_match = _MAILTO_RE.search(unsubscribe_header)
         if mailto_match:
             unsubscribe_email = mailto_match.group(1)
             
@@ -443,7 +744,7 @@ def unsubscribe_from_email(service: Any, message_id: str) -> bool:
             console.print(f"[green]Unsubscribe email sent to: {unsubscribe_email}[/green]")
             return True
         
-        http_match = re.search(r'<(https?://[^>]+)>', unsubscribe_header)
+        http_match = _HTTP_RE.search(unsubscribe_header)
         if http_match:
             unsubscribe_url = http_match.group(1)
             console.print(f"[yellow]Unsubscribe link (manual action required): {unsubscribe_url}[/yellow]")
@@ -457,20 +758,34 @@ def unsubscribe_from_email(service: Any, message_id: str) -> bool:
         return False
 
 def create_task(task_description: str, sender: str) -> bool:
-    """Append task to tasks.md file."""
+    """Queue a task for tasks.md; queued tasks are appended in one write by flush_tasks()."""
     try:
         task_entry = f"- [ ] {task_description} (From: {sender})\n"
-        
-        with open('tasks.md', 'a', encoding='utf-8') as f:
-            f.write(task_entry)
-        
-        console.print(f"[green]Task added to tasks.md[/green]")
+        _task_buffer.append(task_entry)
         return True
     
     except Exception as error:
         console.print(f"[red]Error creating task: {error}[/red]")
         return False
 
+def flush_tasks() -> bool:
+    """Append all queued tasks to tasks.md with a single open and write."""
+    if not _task_buffer:
+        return True
+    
+    try:
+        with open(TASKS_FILE, 'a', encoding='utf-8') as f:
+            f.writelines(_task_buffer)
+        console.print(f"[green]Wrote {len(_task_buffer)} task(s) to {TASKS_FILE}[/green]")
+        _task_buffer.clear()
+        return True
+    
+    except Exception as error:
+        console.print(f"[red]Could not write {len(_task_buffer)} queued task(s) to {TASKS_FILE}: {error}[/red]")
+        return False
+
+atexit.register(flush_tasks)
+
 def display_email_info(email: Dict, analysis: Dict, index: int, total: int):
     """Display email information and AI analysis using rich formatting."""
     
@@ -507,6 +822,26 @@ def display_email_info(email: Dict, analysis: Dict, index: int, total: int):
     
     console.print(panel)
 
+def _getch() -> str:
+    """Read a single keypress from the terminal without waiting for Enter."""
+    fd = sys.stdin.fileno()
+    old_settings = termios.tcgetattr(fd)
+    try:
+        tty.setcbreak(fd)
+        return sys.stdin.read(1)
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+
+def read_action(action_prompt: str) -> str:
+    """Ask for an action, as a single keypress when the terminal supports it."""
+    if termios is None or not sys.stdin.isatty():
+        return Prompt.ask(action_prompt).lower()
+    
+    console.print(f"{action_prompt}: ", end="")
+    action = _getch().lower()
+    console.print(action)
+    return action
+
 def get_action_prompt(suggested_action: str) -> str:
     """Generate action prompt based on AI suggestion."""
     action_map = {
@@ -529,20 +864,52 @@ def get_action_prompt(suggested_action: str) -> str:
 
 def process_emails(provider: str, service_or_token: Any, emails: List[Dict]):
     """Process emails with AI analysis and user actions."""
+    if provider != 'outlook':
+        # Gmail gives us IDs; fetch every message in one batched request up front
+        with console.status("[bold green]Fetching emails..."):
+            gmail_details = {
+                details['id']: details
+                for details in get_email_details_batch(service_or_token, emails)
+            }
+    
+    # Analyze every email in the background, AI_BATCH_SIZE emails per request, so
+    # results are usually ready by the time the user gets to them
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=AI_MAX_WORKERS)
+    analyses = {}
+    to_analyze = []
+    for details in (emails if provider == 'outlook' else gmail_details.values()):
+        # Bulk mail is classified from its headers alone, without calling Claude
+        quick = _quick_classify(details)
+        if quick:
+            analyses[details['id']] = quick
+        else:
+            to_analyze.append(details)
+    
+    for start in range(0, len(to_analyze), AI_BATCH_SIZE):
+        chunk = to_analyze[start:start + AI_BATCH_SIZE]
+        future = executor.submit(analyze_emails_with_ai_batch, chunk)
+        for n, details in enumerate(chunk):
+            analyses[details['id']] = (future, n)
+    
+    # Outlook deletes are queued and sent in $batch calls of up to 20
+    pending_deletes = []
+    
     for i, email_data in enumerate(emails, 1):
         if provider == 'outlook':
             email_details = email_data  # Outlook emails already have full details
         else:
-            email_details = get_email_details(service_or_token, email_data)
+            email_details = gmail_details.get(email_data)
             if not email_details:
                 continue
         
-        with console.status("[bold green]Analyzing email with AI..."):
-            analysis = analyze_email_with_ai(
-                email_details['sender'],
-                email_details['subject'],
-                email_details['body']
-            )
+        analysis = analyses[email_details['id']]
+        if isinstance(analysis, tuple):
+            future, n = analysis
+            if future.done():
+                analysis = future.result()[n]
+            else:
+                with console.status("[bold green]Analyzing email with AI..."):
+                    analysis = future.result()[n]
         
         if not analysis:
             continue
@@ -550,15 +917,15 @@ def process_emails(provider: str, service_or_token: Any, emails: List[Dict]):
         display_email_info(email_details, analysis, i, len(emails))
         
         action_prompt = get_action_prompt(analysis['suggested_action'])
-        action = Prompt.ask(action_prompt).lower()
+        action = read_action(action_prompt)
         
         if action in ['d', 'delete']:
             if provider == 'outlook':
-                success = delete_outlook_email(service_or_token, email_details['id'])
-            else:
-                success = delete_email(service_or_token, email_details['id'])
-            
-            if success:
+                pending_deletes.append(email_details)
+                console.print("[green]✓ Email queued for deletion[/green]")
+                if len(pending_deletes) >= GRAPH_BATCH_LIMIT:
+                    flush_outlook_deletes(pending_deletes)
+            elif delete_email(service_or_token, email_details['id']):
                 console.print("[green]✓ Email deleted[/green]")
             else:
                 console.print("[red]✗ Failed to delete email[/red]")
@@ -567,7 +934,7 @@ def process_emails(provider: str, service_or_token: Any, emails: List[Dict]):
             if provider == 'outlook':
                 unsubscribe_from_outlook_email(service_or_token, email_details['id'], email_details['headers'])
             else:
-                unsubscribe_from_email(service_or_token, email_details['id'])
+                unsubscribe_from_email(service_or_token, email_details['id'], email_details['headers'])
         
         elif action in ['t', 'task']:
             task_desc = analysis.get('task_description')
@@ -575,12 +942,15 @@ def process_emails(provider: str, service_or_token: Any, emails: List[Dict]):
                 task_desc = Prompt.ask("Enter task description")
             
             if create_task(task_desc, email_details['sender']):
-                console.print("[green]✓ Task created[/green]")
+                console.print(f"[green]✓ Task queued; it is written to {TASKS_FILE} when the session ends[/green]")
         
         elif action in ['r', 'reply']:
             console.print("[yellow]Reply functionality not implemented in this prototype[/yellow]")
         
         elif action in ['q', 'quit']:
+            executor.shutdown(wait=False, cancel_futures=True)
+            flush_outlook_deletes(pending_deletes)
+            flush_tasks()
             console.print("[blue]Goodbye![/blue]")
             return
         
@@ -591,6 +961,10 @@ def process_emails(provider: str, service_or_token: Any, emails: List[Dict]):
             console.print("[red]Invalid action, skipping email[/red]")
         
         console.print()  # Add spacing between emails
+    
+    executor.shutdown(wait=False)
+    flush_outlook_deletes(pending_deletes)
+    flush_tasks()
 
 def main():
     """Main application loop."""
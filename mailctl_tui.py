@@ -11,8 +11,6 @@ from rich.prompt import Prompt
 # Add src directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.tui_app import run_tui
-
 console = Console()
 
 
@@ -28,6 +26,10 @@ def main():
 
         console.print(f"[green]Starting mailctl TUI with {provider_choice}...[/green]")
 
+        # Imported only now, so the provider prompt is not held up by loading
+        # textual and the provider and AI clients
+        from src.tui_app import run_tui
+
         # Run the TUI
         run_tui(provider_choice)
 
@@ -57,6 +57,9 @@ def run_cli_mode(provider: str):
 
         console.print(f"[blue]Found {len(emails)} unread emails[/blue]")
 
+        # Group threads once for the whole inbox instead of once per email
+        thread_index, threads = ai_analyzer.thread_analyzer.build_thread_index(emails)
+
         # Process emails one by one (simplified CLI version)
         for i, email in enumerate(emails, 1):
             console.print(f"\n[bold]Email {i}/{len(emails)}[/bold]")
@@ -65,7 +68,9 @@ def run_cli_mode(provider: str):
 
             # Analyze with AI
             with console.status("[bold green]Analyzing with AI..."):
-                analysis = ai_analyzer.analyze_email_with_context(email, emails)
+                analysis = ai_analyzer.analyze_email_with_context(
+                    email, emails, thread_index=thread_index, threads=threads
+                )
 
             if analysis:
                 console.print(f"Category: {analysis.get('category', 'Unknown')}")
@@ -91,7 +96,9 @@ def run_cli_mode(provider: str):
                     console.print("[red]✗ Failed to delete[/red]")
 
             elif action == "reply":
-                draft = ai_analyzer.generate_draft_reply(email, all_emails=emails)
+                draft = ai_analyzer.generate_draft_reply(
+                    email, all_emails=emails, thread_index=thread_index, threads=threads
+                )
                 if draft:
                     console.print("\n[bold]Generated draft:[/bold]")
                     console.print(f"Subject: {draft.get('subject', '')}")
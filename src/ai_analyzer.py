@@ -2,192 +2,643 @@
 AI-powered email analysis and draft generation
 """
 
+import asyncio
+import atexit
+import hashlib
+import html
 import json
 import os
-from typing import Dict, List, Optional
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 import anthropic
 from dotenv import load_dotenv
 
 from .thread_analyzer import ThreadAnalyzer
 
+# orjson encodes and decodes cached results several times faster when installed
+# (storing UTF-8 bytes); the stdlib json module is the fallback
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
 load_dotenv()
 
+MODEL = "claude-3-5-sonnet-20241022"
+
+# Emails per batched analysis request, and how many such requests may be in flight at once
+BATCH_SIZE = 20
+BATCH_CONCURRENCY = 5
+
+# On-disk cache of Claude results, so unchanged emails are not re-sent on the next run
+AI_CACHE_PATH = ".mailctl_ai_cache.sqlite3"
+CACHE_TTL = 30 * 86400
+# Bulk mail repeats with small changes, so its entries expire quickly; task requests
+# are never cached because the same wording can ask for different work each time
+CATEGORY_TTLS = {'Newsletter': 86400, 'Promotion': 86400}
+UNCACHED_CATEGORIES = frozenset({'TaskRequest'})
+# Only bulk mail, whose analysis does not hinge on its figures, is shared between
+# near-identical emails through the template key; anything else (e.g. two invoices
+# from one sender that differ only in their amounts) is matched on the exact key only
+TEMPLATE_CATEGORIES = frozenset({'Newsletter', 'Promotion', 'Transactional'})
+
+# Volatile parts of an email (links, numbers, spacing) masked out of the template key
+_URL_RE = re.compile(r'https?://\S+')
+_DIGITS_RE = re.compile(r'\d+')
+_SPACE_RE = re.compile(r'\s+')
+
+# Email bodies are sent to Claude compacted: markup and quoted history removed, then
+# capped at a token budget, as are whole prompts
+BODY_TOKENS = 200
+THREAD_BODY_TOKENS = 50
+ANALYSIS_PROMPT_TOKENS = 3500
+DRAFT_PROMPT_TOKENS = 6000
+# Approximate Claude tokenization: a word costs one token per 4 ASCII chars, or one per
+# char otherwise (e.g. CJK), and each other non-space char is a token of its own
+_TOKEN_RE = re.compile(r'\w+|\S')
+_HTML_BLOCK_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_QUOTE_RE = re.compile(r'^(?:On .{0,200}wrote:|>|-{2,} ?Original Message ?-{2,})', re.MULTILINE)
+
+# Rule-based triage of mail that needs no model to classify
+_NOREPLY_RE = re.compile(r'\b(?:no-?reply|do-?not-?reply|notifications?)@', re.IGNORECASE)
+_RECEIPT_RE = re.compile(r'\b(?:order|receipt|invoice|payment|shipped|shipping|confirmation)\b', re.IGNORECASE)
+_UNSUBSCRIBE_RE = re.compile(r'unsubscribe', re.IGNORECASE)
+BULK_PRECEDENCES = frozenset({'bulk', 'list', 'junk'})
+
+# Label vocabularies, interned so that labels parsed from responses share storage
+# and compare by identity when used as dict keys
+CATEGORIES = tuple(map(sys.intern, (
+    'Important', 'Newsletter', 'Promotion', 'Transactional', 'Spam', 'TaskRequest'
+)))
+PRIORITIES = tuple(map(sys.intern, ('High', 'Medium', 'Low')))
+SUGGESTED_ACTIONS = tuple(map(sys.intern, (
+    'Reply', 'Delete', 'Unsubscribe', 'CreateTask', 'Schedule', 'Archive', 'NoAction'
+)))
+
+# Tool schemas: Claude is made to answer by "calling" one of these tools, so its
+# output arrives as an already parsed dict in this shape instead of free-form text
+ANALYSIS_PROPERTIES = {
+    "summary": {"type": "string", "description": "A concise one-sentence summary of the email's content and intent."},
+    "category": {"type": "string", "enum": list(CATEGORIES)},
+    "priority": {"type": "string", "enum": list(PRIORITIES)},
+    "suggested_action": {"type": "string", "enum": list(SUGGESTED_ACTIONS)},
+    "urgency_indicators": {"type": "array", "items": {"type": "string"},
+                           "description": "Urgency keywords found in the email."},
+    "requires_response": {"type": "boolean"},
+    "estimated_response_time": {"type": ["string", "null"],
+                                "description": "Quick (2min), Medium (15min), Long (1hr+), or null"},
+    "task_description": {"type": ["string", "null"],
+                         "description": "If action needed, describe the specific task. Otherwise, null."},
+    "thread_position": {"type": "string", "description": "First message, Follow-up, or Ongoing conversation"}
+}
+ANALYSIS_REQUIRED = ["summary", "category", "priority", "suggested_action"]
+ANALYSIS_SCHEMA = {"type": "object", "properties": ANALYSIS_PROPERTIES, "required": ANALYSIS_REQUIRED}
+
+# Claude writes analyses under short keys, declared once in the system prompt, to
+# save output tokens; they are expanded back to the long keys as they arrive
+ANALYSIS_KEYS = {
+    "s": "summary", "c": "category", "p": "priority", "a": "suggested_action",
+    "u": "urgency_indicators", "r": "requires_response", "e": "estimated_response_time",
+    "t": "task_description", "tp": "thread_position", "th": "thread"
+}
+_SHORT_KEYS = {long: short for short, long in ANALYSIS_KEYS.items()}
+_SHORT_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {_SHORT_KEYS[field]: prop for field, prop in ANALYSIS_PROPERTIES.items()},
+    "required": [_SHORT_KEYS[field] for field in ANALYSIS_REQUIRED]
+}
+
+ANALYSIS_SYSTEM_PROMPT = (
+    "You triage email. Record results with the provided tool, using these short keys: "
+    + ", ".join(f"{short}={long}" for short, long in ANALYSIS_KEYS.items())
+    + ". When thread context is given, weigh it in p and a, and fill th."
+)
+DRAFT_TYPE_INSTRUCTIONS = {
+    'standard': 'Provide a complete, professional response addressing all points',
+    'quick_acknowledgment': 'Brief acknowledgment that you received the email and will respond soon',
+    'detailed_response': 'Comprehensive response with detailed explanations',
+    'scheduling': 'Focus on scheduling/calendar coordination',
+    'summary': 'Summarize the thread and provide clear next steps',
+    'decline': 'Politely decline the request with brief explanation'
+}
+DRAFT_SYSTEM_PROMPT = (
+    "You draft email replies and record them with the provided tool. Consider the conversation "
+    "history for context and continuity, match the relationship level the thread shows, and "
+    "address the sender's points and questions. confidence reflects how sure you are the reply "
+    "is appropriate. Write the reply type you are given, set reply_type_used to it, and use "
+    "standard for unknown types.\n\nReply types:\n"
+    + "\n".join(f"- {name}: {instruction}" for name, instruction in DRAFT_TYPE_INSTRUCTIONS.items())
+)
+
+
+def _cached_system(text: str) -> List[Dict]:
+    """System prompt blocks marked for Anthropic prompt caching, so the static prefix
+    (tool schemas and instructions) is reused across calls instead of re-processed."""
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+ANALYSIS_SYSTEM = _cached_system(ANALYSIS_SYSTEM_PROMPT)
+DRAFT_SYSTEM = _cached_system(DRAFT_SYSTEM_PROMPT)
+
+ANALYSIS_TOOL = {
+    "name": "email_analysis",
+    "description": "Record the analysis of one email.",
+    "input_schema": _SHORT_ANALYSIS_SCHEMA
+}
+# With thread context, the same call also reports on the conversation, replacing the
+# local reply heuristics of ThreadAnalyzer (still used when no AI result is available)
+REPLY_URGENCIES = ('high', 'normal', 'low')
+THREAD_PROPERTIES = {
+    "conversation_summary": {"type": "string", "description": "One sentence on where the conversation stands."},
+    "reply_recommended": {"type": "boolean"},
+    "reply_urgency": {"type": "string", "enum": list(REPLY_URGENCIES)},
+    "suggested_reply_type": {"type": "string", "enum": list(DRAFT_TYPE_INSTRUCTIONS)},
+    "reply_confidence": {"type": "number", "description": "0-1, how sure you are about the reply fields"},
+    "urgency_escalation": {"type": "boolean", "description": "Whether urgency rose over the thread."}
+}
+THREAD_SCHEMA = {"type": "object", "properties": THREAD_PROPERTIES, "required": ["reply_recommended", "reply_urgency"]}
+THREAD_ANALYSIS_TOOL = {
+    "name": "email_thread_analysis",
+    "description": "Record the analysis of one email and of the thread it belongs to.",
+    "input_schema": {
+        "type": "object",
+        "properties": {**_SHORT_ANALYSIS_SCHEMA["properties"], _SHORT_KEYS["thread"]: THREAD_SCHEMA},
+        "required": _SHORT_ANALYSIS_SCHEMA["required"] + [_SHORT_KEYS["thread"]]
+    }
+}
+BATCH_ANALYSIS_TOOL = {
+    "name": "email_analyses",
+    "description": "Record the analyses of several emails, one per email, in input order.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "analyses": {
+                "type": "array",
+                "items": _SHORT_ANALYSIS_SCHEMA
+            }
+        },
+        "required": ["analyses"]
+    }
+}
+DRAFT_TOOL = {
+    "name": "draft_reply",
+    "description": "Record a drafted email reply.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "subject": {"type": "string", "description": "Re: [appropriate subject line]"},
+            "body": {"type": "string", "description": "The complete email body text"},
+            "confidence": {"type": "number", "description": "0-1, how sure you are this reply is appropriate"},
+            "requires_review": {"type": "boolean"},
+            "suggested_edits": {"type": "array", "items": {"type": "string"}},
+            "reply_type_used": {"type": "string"},
+            "thread_aware": {"type": "boolean"}
+        },
+        "required": ["subject", "body", "confidence", "requires_review"]
+    }
+}
+BULK_ACTIONS = ("delete", "archive", "unsubscribe", "review", "priority")
+BULK_TOOL = {
+    "name": "bulk_triage",
+    "description": "Record email numbers grouped by suggested bulk action.",
+    "input_schema": {
+        "type": "object",
+        "properties": {action: {"type": "array", "items": {"type": "integer"}} for action in BULK_ACTIONS},
+        "required": list(BULK_ACTIONS)
+    }
+}
+
+
+class Analysis(NamedTuple):
+    """Read-only view of an analysis dict with the display defaults filled in."""
+
+    category: str = 'Unknown'
+    priority: str = 'Medium'
+    summary: str = 'No summary'
+    suggested_action: str = 'NoAction'
+    thread_context: Optional[Dict] = None
+
+    @classmethod
+    def from_dict(cls, analysis: Dict) -> 'Analysis':
+        """Build an Analysis from the dict returned by AIAnalyzer, ignoring extra keys."""
+        return cls._make(analysis.get(field, default) for field, default in _ANALYSIS_DEFAULTS)
+
+
+_ANALYSIS_DEFAULTS = tuple(Analysis._field_defaults.items())
+
+
+def _expand_keys(analysis: Dict) -> Dict:
+    """Rename the short keys of an analysis written by Claude to the long ones."""
+    return {ANALYSIS_KEYS.get(key, key): value for key, value in analysis.items()}
+
+
+def _budget(text: str, max_tokens: int) -> str:
+    """Cut text at the token boundary where it reaches about max_tokens tokens."""
+    if len(text) <= max_tokens:
+        return text  # Every token spans at least one char
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        piece = match.group()
+        chars_per_token = 4 if piece.isascii() else 1
+        cost = -(-len(piece) // chars_per_token)
+        if used + cost > max_tokens:
+            # Keep whatever part of this piece still fits (e.g. of a long base64 run)
+            return text[:match.start() + (max_tokens - used) * chars_per_token].rstrip()
+        used += cost
+    return text
+
+
+def _last(items: Iterable):
+    """Drain an iterable (e.g. a response stream) and return its final item, or None."""
+    item = None
+    for item in items:
+        pass
+    return item
+
+
+def _template_shareable(analysis: Dict) -> bool:
+    """Whether a cached analysis may be reused for other emails with the same template key."""
+    return (
+        analysis.get('category') in TEMPLATE_CATEGORIES
+        and analysis.get('suggested_action') != 'CreateTask'
+        and not analysis.get('task_description')
+    )
+
+
+class ResponseCache:
+    """SQLite-backed cache of Claude results.
+
+    Entries are found by an exact key or, failing that, by an optional template
+    key that groups near-identical emails (same sender and text once links and
+    numbers are masked), such as successive issues of a newsletter.
+    """
+
+    def __init__(self, path: str = AI_CACHE_PATH):
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._init_schema()
+        except sqlite3.Error:
+            # Database unusable (e.g. read-only directory); cache in memory only
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._init_schema()
+        atexit.register(self.close)
+
+    def _init_schema(self) -> None:
+        """Create the responses table if needed and drop expired rows."""
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, template_key TEXT, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_template ON responses (template_key)")
+            self._conn.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+
+    def get(self, key: str, template_key: Optional[str] = None) -> Optional[Dict]:
+        """Return the cached result for key (or, failing that, template_key), or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                return _json_loads(row[0])
+            if template_key is None:
+                return None
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE template_key = ? AND expires > ? "
+                "ORDER BY expires DESC LIMIT 1", (template_key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        # Rows written before template keys were limited to bulk mail may carry one
+        value = _json_loads(row[0])
+        return value if _template_shareable(value) else None
+
+    def put(self, key: str, value: Dict, template_key: Optional[str] = None) -> None:
+        """Store a result, with a lifetime that depends on its category."""
+        category = value.get('category')
+        if category in UNCACHED_CATEGORIES:
+            return
+        expires = time.time() + CATEGORY_TTLS.get(category, CACHE_TTL)
+        if not _template_shareable(value):
+            template_key = None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, template_key, value, expires) VALUES (?, ?, ?, ?)",
+                (key, template_key, _json_dumps(value), expires)
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
 
 class AIAnalyzer:
     """AI-powered email analyzer using Claude"""
 
     def __init__(self):
         self.client = None
+        self.api_key = None
         self.thread_analyzer = ThreadAnalyzer()
+        self._analysis_cache: Dict[tuple, Dict] = {}
+        self._cache = ResponseCache(AI_CACHE_PATH)
+        # Input token usage across calls, showing how much prompt caching saves
+        self.cache_stats = {'input_tokens': 0, 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if api_key:
             self.client = anthropic.Anthropic(api_key=api_key)
+            self.api_key = api_key
 
-    def analyze_email(self, sender: str, subject: str, body: str, thread_context: List[Dict] = None) -> Optional[Dict]:
+    def analyze_email(self,
+                      sender: str,
+                      subject: str,
+                      body: str,
+                      thread_context: List[Dict] = None,
+                      headers: Dict[str, str] = None) -> Optional[Dict]:
         """Analyze email content using Claude AI with optional thread context."""
+        return _last(self.analyze_email_stream(sender, subject, body, thread_context, headers))
+
+    def analyze_email_stream(self,
+                             sender: str,
+                             subject: str,
+                             body: str,
+                             thread_context: List[Dict] = None,
+                             headers: Dict[str, str] = None) -> Iterator[Dict]:
+        """Yield progressively more complete analyses while Claude streams; the last one is final.
+
+        Mail that the header rules of _rule_triage can classify is answered without Claude.
+        """
+        triaged = self._rule_triage(sender, subject, body, headers)
+        if triaged is not None:
+            yield triaged
+            return
+
         if not self.client:
-            return self._fallback_analysis()
+            yield self._fallback_analysis()
+            return
 
         try:
-            thread_info = ""
+            prompt = f"From: {sender}\nSubject: {subject}\nBody: {self._compact_body(body)}"
             if thread_context:
-                thread_info = f"\n\nThread Context ({len(thread_context)} previous messages):\n"
+                prompt += f"\n\nThread ({len(thread_context)} previous messages):"
                 for i, msg in enumerate(thread_context[-3:], 1):  # Last 3 messages for context
-                    thread_info += f"{i}. From: {msg.get('sender', 'Unknown')} - {msg.get('subject', 'No subject')}\n"
-                    thread_info += f"   {msg.get('body', '')[:200]}...\n"
+                    prompt += f"\n{i}. {self._preview(msg)}"
+            prompt = _budget(prompt, ANALYSIS_PROMPT_TOKENS)
 
-            prompt = f"""
-            Analyze this email and return a JSON object with the following structure:
-
-            {{
-              "summary": "A concise one-sentence summary of the email's content and intent.",
-              "category": "Choose one: Important, Newsletter, Promotion, Transactional, Spam, TaskRequest",
-              "priority": "Choose one: High, Medium, Low",
-              "suggested_action": "Choose one: Reply, Delete, Unsubscribe, CreateTask, Schedule, Archive, NoAction",
-              "urgency_indicators": ["list", "of", "urgency", "keywords", "found"],
-              "requires_response": true/false,
-              "estimated_response_time": "Quick (2min), Medium (15min), Long (1hr+), or null",
-              "task_description": "If action needed, describe the specific task. Otherwise, null.",
-              "thread_position": "First message, Follow-up, or Ongoing conversation"
-            }}
-
-            Email Details:
-            From: {sender}
-            Subject: {subject}
-            Body: {body[:1500]}
-            {thread_info}
-
-            Consider the thread context when determining priority and suggested actions.
-            Return only the JSON object, no additional text.
-            """
+            tool = THREAD_ANALYSIS_TOOL if thread_context else ANALYSIS_TOOL
+            yield from self._stream_tool(prompt, tool, max_tokens=1000,
+                                         system=ANALYSIS_SYSTEM, expand=True,
+                                         schema=ANALYSIS_SCHEMA, defaults=self._fallback_analysis())
 
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1000,
-                messages=[{"role": "user", "content": prompt}]
-            )
+        except Exception:
+            yield self._fallback_analysis()
 
-            response_text = message.content[0].text.strip()
+    def _stream_tool(self,
+                     prompt: str,
+                     tool: Dict,
+                     max_tokens: int,
+                     system=anthropic.NOT_GIVEN,
+                     expand: bool = False,
+                     schema: Dict = None,
+                     defaults: Dict = None) -> Iterator[Dict]:
+        """Stream a forced tool call, yielding its partially parsed input and then the final
+        input (checked against schema, or the tool's own, when defaults are given).
 
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start != -1 and json_end != 0:
-                json_text = response_text[json_start:json_end]
-                return json.loads(json_text)
-            else:
-                return json.loads(response_text)
+        With expand, short analysis keys are renamed to long ones in every item.
+        """
+        last_partial = None
+        with self.client.messages.stream(
+            model=MODEL,
+            max_tokens=max_tokens,
+            system=system,
+            tools=[tool],
+            tool_choice={"type": "tool", "name": tool["name"]},
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            for event in stream:
+                if event.type == 'input_json' and isinstance(event.snapshot, dict):
+                    if event.snapshot != last_partial:
+                        last_partial = dict(event.snapshot)
+                        yield _expand_keys(last_partial) if expand else last_partial
+            message = stream.get_final_message()
 
-        except Exception:
-            return self._fallback_analysis()
+        final = self._tool_input(message)
+        if expand and isinstance(final, dict):
+            final = _expand_keys(final)
+        yield final if defaults is None else self._validate(final, schema or tool["input_schema"], defaults)
+
+    def _tool_input(self, message) -> Dict:
+        """Return the input of the tool call in a Claude message, recording its token usage."""
+        usage = getattr(message, 'usage', None)
+        for field in self.cache_stats:
+            self.cache_stats[field] += getattr(usage, field, None) or 0
+        for block in message.content:
+            if block.type == 'tool_use':
+                return block.input
+        raise ValueError("Claude response contained no tool call")
+
+    def _validate(self, data, schema: Dict, defaults: Dict):
+        """Thin schema check of a tool input: fill missing required fields and replace
+        values outside an enum with defaults; anything but a dict is returned as is."""
+        if not isinstance(data, dict):
+            return data
+        for field in schema.get("required", ()):
+            if field not in data and field in defaults:
+                data[field] = defaults[field]
+        for field, prop in schema["properties"].items():
+            if "enum" in prop and field in data and data[field] not in prop["enum"]:
+                data[field] = defaults.get(field, data[field])
+        return data
 
     def generate_draft_reply(self,
                            email: Dict,
                            all_emails: List[Dict] = None,
                            reply_tone: str = "professional",
-                           reply_type: str = "auto") -> Optional[Dict]:
-        """Generate a draft reply for an email with enhanced thread awareness."""
+                           reply_type: str = "auto",
+                           thread_index: Dict[str, str] = None,
+                           threads: Dict[str, List[Dict]] = None) -> Optional[Dict]:
+        """Generate a draft reply for an email with enhanced thread awareness.
+
+        ``thread_index``/``threads`` are an optional precomputed thread grouping
+        (see ThreadAnalyzer.build_thread_index) that skips re-grouping all_emails.
+        """
+        return _last(self.generate_draft_reply_stream(
+            email, all_emails, reply_tone, reply_type, thread_index, threads
+        ))
+
+    def generate_draft_reply_stream(self,
+                                    email: Dict,
+                                    all_emails: List[Dict] = None,
+                                    reply_tone: str = "professional",
+                                    reply_type: str = "auto",
+                                    thread_index: Dict[str, str] = None,
+                                    threads: Dict[str, List[Dict]] = None) -> Iterator[Optional[Dict]]:
+        """Yield partial drafts (e.g. a growing 'body') while Claude streams; the last item is
+        the final draft, or None if it could not be generated."""
         if not self.client:
-            return None
+            yield None
+            return
 
         try:
-            # Get thread context and analysis
-            thread_context = []
-            thread_summary = "No conversation history"
-            reply_recommendations = {"should_reply": True, "reply_type": "standard"}
-
-            if all_emails:
-                thread_context = self.thread_analyzer.get_thread_context(email, all_emails)
-                if thread_context:
-                    thread_summary = self.thread_analyzer.get_conversation_summary(thread_context + [email])
-                    reply_recommendations = self.thread_analyzer.should_draft_reply(email, thread_context)
-
-            # Auto-determine reply type if set to auto
-            if reply_type == "auto":
-                reply_type = reply_recommendations.get('reply_type', 'standard')
-
-            thread_info = ""
-            if thread_context:
-                thread_info = f"\n\nConversation Context: {thread_summary}\n\n"
-                thread_info += "Recent Messages in Thread:\n"
-                for i, msg in enumerate(thread_context[-3:], 1):  # Last 3 messages
-                    thread_info += f"{i}. From: {msg.get('sender', 'Unknown')}\n"
-                    thread_info += f"   Subject: {msg.get('subject', 'No subject')}\n"
-                    thread_info += f"   {msg.get('body', '')[:300]}...\n\n"
-
-            # Enhanced prompt based on reply type
-            type_instructions = {
-                'standard': 'Provide a complete, professional response addressing all points',
-                'quick_acknowledgment': 'Brief acknowledgment that you received the email and will respond soon',
-                'detailed_response': 'Comprehensive response with detailed explanations',
-                'scheduling': 'Focus on scheduling/calendar coordination',
-                'summary': 'Summarize the thread and provide clear next steps',
-                'decline': 'Politely decline the request with brief explanation'
-            }
+            cache_key, prompt = self._prepare_draft_prompt(
+                email, all_emails, reply_tone, reply_type, thread_index, threads
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                yield cached
+                return
 
-            instruction = type_instructions.get(reply_type, type_instructions['standard'])
+            # Hold each item back by one so the final, complete parse can be
+            # finalized and cached before it is yielded
+            draft = None
+            for item in self._stream_tool(prompt, DRAFT_TOOL, max_tokens=1500,
+                                          system=DRAFT_SYSTEM):
+                if draft is not None:
+                    yield draft
+                draft = item
 
-            prompt = f"""
-            Generate a professional email reply based on the email and conversation context below.
-
-            Reply Guidelines:
-            - Tone: {reply_tone}
-            - Type: {reply_type} - {instruction}
-            - Consider the full conversation history for context and continuity
-            - Be appropriate for the relationship level indicated by the thread
-            - Address the sender's main points and any questions asked
-            - Confidence level should reflect how sure you are this reply is appropriate
-
-            Current Email to Reply To:
-            From: {email.get('sender', 'Unknown')}
-            Subject: {email.get('subject', 'No Subject')}
-            Body: {email.get('body', '')}
-            {thread_info}
-
-            Reply Recommendations from Analysis:
-            - Should reply: {reply_recommendations.get('should_reply', True)}
-            - Urgency: {reply_recommendations.get('reply_urgency', 'normal')}
-            - Confidence: {reply_recommendations.get('confidence', 0.5)}
-
-            Return a JSON object with:
-            {{
-              "subject": "Re: [appropriate subject line]",
-              "body": "The complete email body text",
-              "confidence": 0.85,
-              "requires_review": true/false,
-              "suggested_edits": ["list", "of", "suggestions", "for", "user"],
-              "reply_type_used": "{reply_type}",
-              "thread_aware": true/false
-            }}
-
-            Return only the JSON object.
-            """
+            yield self._finalize_draft(draft, email, cache_key)
 
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
+        except Exception:
+            yield None
+
+    async def agenerate_draft_reply(self,
+                                   email: Dict,
+                                   all_emails: List[Dict] = None,
+                                   reply_tone: str = "professional",
+                                   reply_type: str = "auto",
+                                   thread_index: Dict[str, str] = None,
+                                   threads: Dict[str, List[Dict]] = None,
+                                   client: Optional[anthropic.AsyncAnthropic] = None) -> Optional[Dict]:
+        """Async variant of generate_draft_reply, so several drafts can be requested concurrently.
+
+        Concurrent calls on one event loop can share a ``client`` (see async_client);
+        without one, a client is opened for this call only.
+        """
+        if not self.api_key:
+            return None
+
+        if client is None:
+            async with self.async_client() as client:
+                return await self.agenerate_draft_reply(
+                    email, all_emails, reply_tone, reply_type, thread_index, threads, client
+                )
+
+        try:
+            cache_key, prompt = self._prepare_draft_prompt(
+                email, all_emails, reply_tone, reply_type, thread_index, threads
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
+            message = await client.messages.create(
+                model=MODEL,
                 max_tokens=1500,
+                system=DRAFT_SYSTEM,
+                tools=[DRAFT_TOOL],
+                tool_choice={"type": "tool", "name": DRAFT_TOOL["name"]},
                 messages=[{"role": "user", "content": prompt}]
             )
 
-            response_text = message.content[0].text.strip()
-
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start != -1 and json_end != 0:
-                json_text = response_text[json_start:json_end]
-                result = json.loads(json_text)
-                result['original_email_id'] = email.get('id')
-                return result
+            return self._finalize_draft(self._tool_input(message), email, cache_key)
 
+        except Exception:
             return None
 
-        except Exception:
+    def _prepare_draft_prompt(self,
+                              email: Dict,
+                              all_emails: List[Dict] = None,
+                              reply_tone: str = "professional",
+                              reply_type: str = "auto",
+                              thread_index: Dict[str, str] = None,
+                              threads: Dict[str, List[Dict]] = None) -> Tuple[str, str]:
+        """Gather thread context for a draft reply and build its (cache key, prompt)."""
+        thread_index, threads = self._resolve_threads(all_emails, thread_index, threads)
+
+        # Get thread context and analysis
+        thread_summary = "No conversation history"
+        reply_recommendations = {"should_reply": True, "reply_type": "standard"}
+
+        thread_context = self._thread_context(email, all_emails, thread_index, threads)
+        if thread_context:
+            # Reuse thread insights from an earlier analysis of this email when available
+            cached = self._analysis_cache.get(
+                self._analysis_cache_key(email, all_emails, thread_index, threads)
+            )
+            cached_thread = cached.get('thread_context') if cached else None
+            if cached_thread:
+                thread_summary = cached_thread.get('conversation_summary', thread_summary)
+                reply_recommendations = {
+                    'should_reply': cached_thread.get('reply_recommended', False),
+                    'reply_urgency': cached_thread.get('reply_urgency', 'normal'),
+                    'reply_type': cached_thread.get('suggested_reply_type', 'standard'),
+                    'confidence': cached_thread.get('reply_confidence', 0.5)
+                }
+            else:
+                thread_summary = self.thread_analyzer.get_conversation_summary(thread_context + [email])
+                reply_recommendations = self.thread_analyzer.should_draft_reply(email, thread_context)
+
+        # Auto-determine reply type if set to auto
+        if reply_type == "auto":
+            reply_type = reply_recommendations.get('reply_type', 'standard')
+
+        cache_key = self._cache_key(
+            'draft', email.get('id', ''), self._body_bytes(email), reply_tone, reply_type,
+            *(msg.get('id', '') for msg in thread_context)
+        )
+
+        thread_info = ""
+        if thread_context:
+            thread_info = f"\n\nConversation: {thread_summary}\nRecent messages:"
+            for i, msg in enumerate(thread_context[-3:], 1):  # Last 3 messages
+                thread_info += f"\n{i}. {self._preview(msg)}"
+
+        # Type instructions live in the cached system prompt; only the name varies.
+        # Thread context comes last, so it is what the token budget trims first.
+        prompt = _budget(
+            f"Tone: {reply_tone}\n"
+            f"Type: {reply_type}\n"
+            f"Analysis: should reply {reply_recommendations.get('should_reply', True)}, "
+            f"urgency {reply_recommendations.get('reply_urgency', 'normal')}, "
+            f"confidence {reply_recommendations.get('confidence', 0.5)}\n\n"
+            f"Reply to:\nFrom: {email.get('sender', 'Unknown')}\n"
+            f"Subject: {email.get('subject', 'No Subject')}\n"
+            f"Body: {self._compact_body(email.get('body', ''))}"
+            f"{thread_info}",
+            DRAFT_PROMPT_TOKENS
+        )
+
+        return cache_key, prompt
+
+    def _finalize_draft(self, draft, email: Dict, cache_key: str) -> Optional[Dict]:
+        """Tag a parsed draft with its email id and store it in the cache."""
+        if not isinstance(draft, dict) or not isinstance(draft.get('body'), str):
             return None
+        draft['original_email_id'] = email.get('id')
+        self._cache_put(cache_key, draft)
+        return draft
 
     def generate_bulk_suggestions(self, emails: List[Dict]) -> Dict[str, List[str]]:
         """Generate bulk action suggestions for multiple emails."""
+        return _last(self.generate_bulk_suggestions_stream(emails))
+
+    def generate_bulk_suggestions_stream(self, emails: List[Dict]) -> Iterator[Dict[str, List[str]]]:
+        """Yield the action groups as Claude streams them; the last item is final."""
         if not self.client:
-            return {"delete": [], "archive": [], "unsubscribe": []}
+            yield {"delete": [], "archive": [], "unsubscribe": []}
+            return
 
         try:
             email_summaries = []
@@ -201,14 +652,7 @@ class AIAnalyzer:
             Emails to analyze:
             {chr(10).join(email_summaries)}
 
-            Return a JSON object with email numbers grouped by action:
-            {{
-              "delete": [1, 5, 8],
-              "archive": [2, 3, 6],
-              "unsubscribe": [4, 7],
-              "review": [9, 10],
-              "priority": [11]
-            }}
+            Record the email numbers grouped by action with the bulk_triage tool.
 
             Guidelines:
             - delete: obvious spam, unwanted promotions
@@ -218,66 +662,398 @@ class AIAnalyzer:
             - priority: urgent or important emails
             """
 
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=800,
-                messages=[{"role": "user", "content": prompt}]
+            yield from self._stream_tool(prompt, BULK_TOOL, max_tokens=800,
+                                         defaults={action: [] for action in BULK_ACTIONS})
+
+        except Exception:
+            yield {action: [] for action in BULK_ACTIONS}
+
+    def analyze_email_with_context(self,
+                                   email: Dict,
+                                   all_emails: List[Dict] = None,
+                                   thread_index: Dict[str, str] = None,
+                                   threads: Dict[str, List[Dict]] = None) -> Optional[Dict]:
+        """Analyze email with full thread context and enhanced recommendations.
+
+        ``thread_index``/``threads`` are an optional precomputed thread grouping
+        (see ThreadAnalyzer.build_thread_index) that skips re-grouping all_emails.
+        """
+        thread_index, threads = self._resolve_threads(all_emails, thread_index, threads)
+        cache_key = self._analysis_cache_key(email, all_emails, thread_index, threads)
+        if cache_key in self._analysis_cache:
+            return self._analysis_cache[cache_key]
+
+        thread_context = self._thread_context(email, all_emails, thread_index, threads)
+
+        # Get basic analysis, from the on-disk cache when this email was seen before.
+        # A fresh one covers the thread in the same call; those thread fields depend on
+        # the rest of the thread, so only the basic part is cached.
+        thread_insights = None
+        disk_key, template_key = self._basic_cache_keys(email)
+        basic_analysis = self._rule_triage_email(email) or self._cache_get(disk_key, template_key)
+        if basic_analysis is None:
+            basic_analysis = self.analyze_email(
+                email.get('sender', ''),
+                email.get('subject', ''),
+                email.get('body', ''),
+                thread_context or None
+            )
+
+            if not basic_analysis:
+                return None
+
+            thread_insights = basic_analysis.pop('thread', None)
+            if basic_analysis != self._fallback_analysis():
+                self._cache_put(disk_key, basic_analysis, template_key)
+
+        self._intern_labels(basic_analysis)
+        analysis = self._add_thread_context(basic_analysis, email, thread_context, thread_insights)
+        self._analysis_cache[cache_key] = analysis
+        return analysis
+
+    def analyze_emails_batch(self,
+                             emails: List[Dict],
+                             all_emails: List[Dict] = None,
+                             thread_index: Dict[str, str] = None,
+                             threads: Dict[str, List[Dict]] = None) -> List[Dict]:
+        """Analyze several emails in a single Claude request, then add thread context to each."""
+        if not emails:
+            return []
+
+        thread_index, threads = self._resolve_threads(all_emails, thread_index, threads)
+        cache_keys = [self._analysis_cache_key(email, all_emails, thread_index, threads) for email in emails]
+        pending = [(email, key) for email, key in zip(emails, cache_keys) if key not in self._analysis_cache]
+
+        # Only send emails that no rule classifies and that are missing from the
+        # on-disk cache to Claude
+        basic_analyses = {}
+        uncached = []
+        for email, _ in pending:
+            cached = self._rule_triage_email(email) or self._cache_get(*self._basic_cache_keys(email))
+            if cached is not None:
+                basic_analyses[id(email)] = cached
+            else:
+                uncached.append(email)
+
+        if uncached:
+            for email, analysis in zip(uncached, self._analyze_batch(uncached)):
+                if analysis != self._fallback_analysis():
+                    disk_key, template_key = self._basic_cache_keys(email)
+                    self._cache_put(disk_key, analysis, template_key)
+                basic_analyses[id(email)] = analysis
+
+        for email, key in pending:
+            analysis = basic_analyses[id(email)]
+            self._intern_labels(analysis)
+            self._analysis_cache[key] = self._add_thread_context(
+                analysis, email, self._thread_context(email, all_emails, thread_index, threads)
             )
 
-            response_text = message.content[0].text.strip()
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
+        return [self._analysis_cache[key] for key in cache_keys]
+
+    def _analyze_batch(self, emails: List[Dict]) -> List[Dict]:
+        """Get basic analyses for a list of emails, in input order.
 
-            if json_start != -1 and json_end != 0:
-                json_text = response_text[json_start:json_end]
-                return json.loads(json_text)
+        Emails are sent BATCH_SIZE per request; several requests run concurrently
+        on the async client, at most BATCH_CONCURRENCY at a time.
+        """
+        if not self.client:
+            return [self._fallback_analysis() for _ in emails]
+
+        chunks = [emails[i:i + BATCH_SIZE] for i in range(0, len(emails), BATCH_SIZE)]
+        if len(chunks) > 1 and self.api_key and not self._loop_running():
+            chunk_results = asyncio.run(self._analyze_chunks_async(chunks))
+        else:
+            chunk_results = [self._analyze_chunk(chunk) for chunk in chunks]
 
-            return {"delete": [], "archive": [], "unsubscribe": [], "review": [], "priority": []}
+        return [analysis for results in chunk_results for analysis in results]
 
+    def _analyze_chunk(self, emails: List[Dict]) -> List[Dict]:
+        """Analyze one chunk of emails with a single blocking Claude call."""
+        try:
+            message = self.client.messages.create(
+                model=MODEL,
+                max_tokens=min(1000 * len(emails), 8000),
+                system=ANALYSIS_SYSTEM,
+                tools=[BATCH_ANALYSIS_TOOL],
+                tool_choice={"type": "tool", "name": BATCH_ANALYSIS_TOOL["name"]},
+                messages=[{"role": "user", "content": self._batch_prompt(emails)}]
+            )
+            return self._parse_batch_response(message, len(emails))
         except Exception:
-            return {"delete": [], "archive": [], "unsubscribe": [], "review": [], "priority": []}
-
-    def analyze_email_with_context(self, email: Dict, all_emails: List[Dict] = None) -> Optional[Dict]:
-        """Analyze email with full thread context and enhanced recommendations."""
-        # Get basic analysis
-        basic_analysis = self.analyze_email(
-            email.get('sender', ''),
-            email.get('subject', ''),
-            email.get('body', '')
+            return [self._fallback_analysis() for _ in emails]
+
+    async def _analyze_chunks_async(self, chunks: List[List[Dict]]) -> List[List[Dict]]:
+        """Analyze chunks concurrently on the async client, bounded by BATCH_CONCURRENCY."""
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def analyze(client: anthropic.AsyncAnthropic, emails: List[Dict]) -> List[Dict]:
+            async with semaphore:
+                try:
+                    message = await client.messages.create(
+                        model=MODEL,
+                        max_tokens=min(1000 * len(emails), 8000),
+                        system=ANALYSIS_SYSTEM,
+                        tools=[BATCH_ANALYSIS_TOOL],
+                        tool_choice={"type": "tool", "name": BATCH_ANALYSIS_TOOL["name"]},
+                        messages=[{"role": "user", "content": self._batch_prompt(emails)}]
+                    )
+                    return self._parse_batch_response(message, len(emails))
+                except Exception:
+                    return [self._fallback_analysis() for _ in emails]
+
+        async with self.async_client() as client:
+            return await asyncio.gather(*(analyze(client, chunk) for chunk in chunks))
+
+    def async_client(self) -> anthropic.AsyncAnthropic:
+        """Open a new async client, to be used as ``async with`` within one event loop.
+
+        None is kept on the analyzer: pooled connections belong to the event loop that
+        opened them, and asyncio.run gives every call a new loop.
+        """
+        return anthropic.AsyncAnthropic(api_key=self.api_key)
+
+    def _loop_running(self) -> bool:
+        """Whether this thread is already running an event loop (asyncio.run would fail)."""
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    def _batch_prompt(self, emails: List[Dict]) -> str:
+        """Build the prompt asking for one analysis per email as a JSON array."""
+        email_blocks = []
+        for i, email in enumerate(emails, 1):
+            email_blocks.append(
+                f"[{i}] From: {email.get('sender', '')}\n"
+                f"Subject: {email.get('subject', '')}\n"
+                f"Body: {self._compact_body(email.get('body', ''))}"
+            )
+
+        return (f"Analyze each of the {len(emails)} emails below: exactly one analysis per email, "
+                f"in the same order.\n\n" + "\n\n".join(email_blocks))
+
+    def _parse_batch_response(self, message, count: int) -> List[Dict]:
+        """Read the analyses from a batch tool call, in input order.
+
+        A response cut off at max_tokens still carries the analyses completed so
+        far (the SDK parses truncated tool input partially); only the rest fall back.
+        """
+        results = self._tool_input(message).get('analyses')
+        if not isinstance(results, list):
+            results = []
+
+        fallback = self._fallback_analysis()
+        analyses = []
+        for i in range(count):
+            result = _expand_keys(results[i]) if i < len(results) and isinstance(results[i], dict) else None
+            if result is not None and 'suggested_action' in result:
+                analyses.append(self._validate(result, ANALYSIS_SCHEMA, fallback))
+            else:
+                analyses.append(self._fallback_analysis())
+        return analyses
+
+    def _compact_body(self, body: str, max_tokens: int = BODY_TOKENS) -> str:
+        """Shrink an email body for a prompt: drop HTML markup and the quoted history
+        below the first reply marker, collapse whitespace and cap at max_tokens tokens."""
+        if '<' in body and _HTML_TAG_RE.search(body):
+            body = html.unescape(_HTML_TAG_RE.sub(' ', _HTML_BLOCK_RE.sub(' ', body)))
+        quote = _QUOTE_RE.search(body)
+        if quote and quote.start() > 0:
+            body = body[:quote.start()]
+        return _budget(_SPACE_RE.sub(' ', body).strip(), max_tokens)
+
+    def _preview(self, msg: Dict) -> str:
+        """Return a thread message's prompt line (sender, subject, compacted body).
+
+        It is built once and stored on the email as '_preview', since the same
+        message appears in the context of every later email of its thread.
+        """
+        preview = msg.get('_preview')
+        if preview is None:
+            preview = msg['_preview'] = (
+                f"From: {msg.get('sender', 'Unknown')} - {msg.get('subject', 'No subject')}\n"
+                f"{self._compact_body(msg.get('body', ''), THREAD_BODY_TOKENS)}"
+            )
+        return preview
+
+    def _cache_key(self, *parts) -> str:
+        """Build an on-disk cache key from the model name and the given str/bytes parts."""
+        digest = hashlib.sha256(MODEL.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _body_bytes(self, email: Dict) -> bytes:
+        """UTF-8 body of an email, using the pre-encoded '_body_utf8' field when present."""
+        body_utf8 = email.get('_body_utf8')
+        if body_utf8 is None:
+            body_utf8 = email.get('body', '').encode('utf-8')
+        return body_utf8
+
+    def _basic_cache_keys(self, email: Dict) -> Tuple[str, str]:
+        """Exact and template cache keys for an email's basic (thread-independent) analysis."""
+        sender = email.get('sender', '')
+        subject = email.get('subject', '')
+        exact_key = self._cache_key('analysis', sender, subject, self._body_bytes(email))
+        template_key = self._cache_key(
+            'analysis-template', sender.lower(), self._template_text(subject),
+            self._template_text(email.get('body', ''))
         )
+        return exact_key, template_key
 
-        if not basic_analysis:
-            return None
+    def _template_text(self, text: str) -> str:
+        """Mask links and numbers and collapse whitespace so near-identical emails match."""
+        text = _URL_RE.sub('<url>', text)
+        text = _DIGITS_RE.sub('0', text)
+        return _SPACE_RE.sub(' ', text).strip().lower()
 
-        # Enhance with thread context
-        if all_emails:
-            thread_context = self.thread_analyzer.get_thread_context(email, all_emails)
-            if thread_context:
-                thread_summary = self.thread_analyzer.get_conversation_summary(thread_context + [email])
-                reply_recommendations = self.thread_analyzer.should_draft_reply(email, thread_context)
-                thread_analysis = self.thread_analyzer.analyze_thread_patterns(thread_context + [email])
-
-                # Enhance the basic analysis with thread insights
-                basic_analysis.update({
-                    'thread_context': {
-                        'thread_length': thread_analysis.get('thread_length', 1),
-                        'participants': thread_analysis.get('participants', []),
-                        'conversation_summary': thread_summary,
-                        'reply_recommended': reply_recommendations.get('should_reply', False),
-                        'reply_urgency': reply_recommendations.get('reply_urgency', 'normal'),
-                        'suggested_reply_type': reply_recommendations.get('reply_type', 'standard')
-                    }
-                })
-
-                # Adjust priority based on thread context
-                if reply_recommendations.get('reply_urgency') == 'high':
-                    basic_analysis['priority'] = 'High'
-                elif thread_analysis.get('urgency_escalation'):
-                    if basic_analysis.get('priority') == 'Low':
-                        basic_analysis['priority'] = 'Medium'
+    def _cache_get(self, key: str, template_key: Optional[str] = None) -> Optional[Dict]:
+        """Return a cached result, or None on a miss."""
+        return self._cache.get(key, template_key)
+
+    def _cache_put(self, key: str, value: Dict, template_key: Optional[str] = None) -> None:
+        """Store a result in the on-disk cache."""
+        self._cache.put(key, value, template_key)
+
+    def _intern_labels(self, analysis: Dict) -> None:
+        """Intern the category/priority/action labels of a parsed analysis in place."""
+        for field in ('category', 'priority', 'suggested_action'):
+            value = analysis.get(field)
+            if isinstance(value, str):
+                analysis[field] = sys.intern(value)
+
+    def _analysis_cache_key(self,
+                            email: Dict,
+                            all_emails: List[Dict] = None,
+                            thread_index: Dict[str, str] = None,
+                            threads: Dict[str, List[Dict]] = None) -> tuple:
+        """Build the memoization key for an email analyzed against a given inbox.
+
+        With a precomputed thread grouping the key only covers the email's own
+        thread, since that is all the analysis depends on; this keeps keying
+        O(thread) instead of O(inbox) per email.
+        """
+        if thread_index is not None and threads is not None:
+            members = threads.get(thread_index.get(email.get('id')), ())
+            return (email.get('id'), tuple(e.get('id') for e in members))
+        return (email.get('id'), tuple(e.get('id') for e in all_emails or []))
+
+    def _resolve_threads(self,
+                         all_emails: Optional[List[Dict]],
+                         thread_index: Optional[Dict[str, str]],
+                         threads: Optional[Dict[str, List[Dict]]]) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Return a (thread index, threads) grouping for all_emails, building it once per
+        inbox list when the caller has none, so each lookup costs O(thread), not O(inbox)."""
+        if (thread_index is not None and threads is not None) or not all_emails:
+            return thread_index, threads
+        return self.thread_analyzer.build_thread_index(all_emails)
+
+    def _thread_context(self,
+                        email: Dict,
+                        all_emails: List[Dict] = None,
+                        thread_index: Dict[str, str] = None,
+                        threads: Dict[str, List[Dict]] = None) -> List[Dict]:
+        """Return the earlier messages of the email's thread, or [] without emails to search."""
+        if not (all_emails or threads):
+            return []
+        return self.thread_analyzer.get_thread_context(
+            email, all_emails, thread_index=thread_index, threads=threads
+        )
+
+    def _add_thread_context(self,
+                            basic_analysis: Dict,
+                            email: Dict,
+                            thread_context: List[Dict],
+                            thread_insights: Optional[Dict] = None) -> Dict:
+        """Enhance a basic analysis with thread insights and priority adjustments.
+
+        thread_insights are the thread fields Claude returned with the analysis; when
+        they are missing or unusable the local ThreadAnalyzer heuristics are used.
+        """
+        if not thread_context:
+            return basic_analysis
+
+        thread_emails = thread_context + [email]
+        if isinstance(thread_insights, dict) and thread_insights.get('reply_urgency') in REPLY_URGENCIES:
+            thread_insights = self._validate(
+                thread_insights, THREAD_SCHEMA, {'reply_recommended': False, 'suggested_reply_type': 'standard'}
+            )
+            participants = list(dict.fromkeys(msg.get('sender', '') for msg in thread_emails))
+            reply_urgency = thread_insights['reply_urgency']
+            urgency_escalation = thread_insights.get('urgency_escalation', False)
+            thread_info = {
+                'thread_length': len(thread_emails),
+                'participants': participants,
+                'conversation_summary': thread_insights.get('conversation_summary')
+                                        or self.thread_analyzer.get_conversation_summary(thread_emails),
+                'reply_recommended': thread_insights['reply_recommended'],
+                'reply_urgency': reply_urgency,
+                'suggested_reply_type': thread_insights.get('suggested_reply_type', 'standard'),
+                'reply_confidence': thread_insights.get('reply_confidence', 0.5)
+            }
+        else:
+            thread_summary = self.thread_analyzer.get_conversation_summary(thread_emails)
+            reply_recommendations = self.thread_analyzer.should_draft_reply(email, thread_context)
+            thread_analysis = self.thread_analyzer.analyze_thread_patterns(thread_emails)
+            reply_urgency = reply_recommendations.get('reply_urgency', 'normal')
+            urgency_escalation = thread_analysis.get('urgency_escalation', False)
+            thread_info = {
+                'thread_length': thread_analysis.get('thread_length', 1),
+                'participants': thread_analysis.get('participants', []),
+                'conversation_summary': thread_summary,
+                'reply_recommended': reply_recommendations.get('should_reply', False),
+                'reply_urgency': reply_urgency,
+                'suggested_reply_type': reply_recommendations.get('reply_type', 'standard'),
+                'reply_confidence': reply_recommendations.get('confidence', 0.5)
+            }
+
+        # Enhance the basic analysis with thread insights
+        basic_analysis['thread_context'] = thread_info
+
+        # Adjust priority based on thread context
+        if reply_urgency == 'high':
+            basic_analysis['priority'] = 'High'
+        elif urgency_escalation:
+            if basic_analysis.get('priority') == 'Low':
+                basic_analysis['priority'] = 'Medium'
 
         return basic_analysis
 
+    def _rule_triage(self, sender: str, subject: str, body: str, headers: Dict[str, str] = None) -> Optional[Dict]:
+        """Classify obvious automated mail from its sender and headers; None means ask Claude."""
+        hdrs = {name.lower(): value for name, value in (headers or {}).items()}
+
+        verdict = None
+        if _NOREPLY_RE.search(sender) and (_RECEIPT_RE.search(subject) or _RECEIPT_RE.search(body[:500])):
+            verdict = ('Transactional', 'Archive', f"Automated notice from {sender}: {subject}")
+        elif 'list-unsubscribe' in hdrs and _UNSUBSCRIBE_RE.search(body):
+            # Account and security notices often carry List-Unsubscribe too; only
+            # mail that also offers unsubscribing in its text is treated as a list
+            verdict = ('Newsletter', 'Unsubscribe', f"Mailing list message from {sender}: {subject}")
+        elif hdrs.get('precedence', '').strip().lower() in BULK_PRECEDENCES:
+            verdict = ('Promotion', 'Archive', f"Bulk mail from {sender}: {subject}")
+        if verdict is None:
+            return None
+
+        analysis = self._fallback_analysis()
+        analysis.update({
+            "summary": verdict[2],
+            "category": verdict[0],
+            "priority": "Low",
+            "suggested_action": verdict[1]
+        })
+        return analysis
+
+    def _rule_triage_email(self, email: Dict) -> Optional[Dict]:
+        """_rule_triage for an email dict."""
+        headers = email.get('headers') or {}
+        if not isinstance(headers, dict):
+            headers = {h.get('name', ''): h.get('value', '') for h in headers}
+        return self._rule_triage(email.get('sender', ''), email.get('subject', ''), email.get('body', ''), headers)
+
     def _fallback_analysis(self) -> Dict:
         """Fallback analysis when AI is not available."""
         return {
@@ -5,13 +5,17 @@ Email provider implementations for Gmail and Outlook
 import json
 import os
 import base64
+import concurrent.futures
 import re
+import time
 import urllib.parse
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from email.mime.text import MIMEText
 
 import msal
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -24,6 +28,71 @@ load_dotenv()
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 OUTLOOK_SCOPES = ['https://graph.microsoft.com/Mail.ReadWrite', 'https://graph.microsoft.com/Mail.Send']
 
+GMAIL_TOKEN_PATH = 'token.json'
+# Gmail credentials and API service per token file, with the file's mtime when they
+# were built, so authenticating again in one process skips the rebuild
+_CREDS_CACHE: Dict[str, Tuple[Optional[int], Credentials, Any]] = {}
+
+# Gmail accepts at most 100 calls per batch request and 1000 ids per batchModify;
+# Graph at most 20 subrequests per $batch
+GMAIL_BATCH_LIMIT = 100
+GMAIL_MODIFY_LIMIT = 1000
+GRAPH_BATCH_URL = 'https://graph.microsoft.com/v1.0/$batch'
+GRAPH_BATCH_LIMIT = 20
+# $batch requests in flight at once; Graph throttles more than four concurrent
+# requests per mailbox
+GRAPH_CONCURRENCY = 4
+GRAPH_MESSAGE_SELECT = 'id,conversationId,sender,subject,body,internetMessageHeaders'
+# Seconds before its stated expiry that a Graph access token is treated as expired
+TOKEN_EXPIRY_MARGIN = 60
+# Partial-response projections: message ids from list, and from get the headers and
+# text parts (three MIME levels deep) without the rest of the payload metadata
+GMAIL_LIST_FIELDS = 'messages/id'
+GMAIL_MESSAGE_FIELDS = (
+    'id,threadId,internalDate,payload(headers,mimeType,body/data,'
+    'parts(mimeType,body/data,parts(mimeType,body/data,parts(mimeType,body/data))))'
+)
+
+# Ask Graph to convert HTML bodies to plain text server-side (message GETs only)
+GRAPH_TEXT_HEADERS = {'Prefer': 'outlook.body-content-type="text"'}
+
+# Characters of body text kept for AI processing; only enough base64 is decoded to
+# cover them even in 3-byte UTF-8 (4 base64 chars encode 3 bytes)
+BODY_LIMIT = 2000
+_BODY_B64_CHARS = BODY_LIMIT * 4
+
+LIST_UNSUBSCRIBE = 'List-Unsubscribe'
+_LIST_UNSUBSCRIBE_KEY = LIST_UNSUBSCRIBE.lower()
+_MAILTO_RE = re.compile(r'<mailto:([^>]+)>')
+
+
+def _graph_session() -> requests.Session:
+    """Build a pooled, retrying session for Microsoft Graph, so connections are kept
+    alive across calls instead of reopened for every request."""
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    ))
+    session.headers.update({'Accept': 'application/json'})
+    return session
+
+
+def _mtime(path: str) -> Optional[int]:
+    """Return a file's modification time in nanoseconds, or None if it is missing."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _index_headers(headers: List[Dict]) -> Dict[str, str]:
+    """Convert a provider's list of {'name', 'value'} headers into a dict keyed by
+    lowercased name, as header names are case-insensitive; like a linear scan, the
+    first occurrence of a repeated header wins."""
+    return {h.get('name', '').lower(): h.get('value', '') for h in reversed(headers or [])}
+
 
 class EmailProvider:
     """Base class for email providers"""
@@ -32,6 +101,10 @@ class EmailProvider:
         """Authenticate with the email provider"""
         raise NotImplementedError
 
+    def is_authenticated(self) -> bool:
+        """Whether credentials from an earlier authenticate() are still usable"""
+        return False
+
     def fetch_unread_emails(self, count: int = 10) -> List[Dict]:
         """Fetch unread emails"""
         raise NotImplementedError
@@ -44,7 +117,11 @@ class EmailProvider:
         """Move email to trash"""
         raise NotImplementedError
 
-    def unsubscribe_from_email(self, message_id: str, headers: List[Dict] = None) -> bool:
+    def delete_emails(self, message_ids: List[str]) -> List[bool]:
+        """Move several emails to trash; returns whether each one was moved, in input order"""
+        return [self.delete_email(message_id) for message_id in message_ids]
+
+    def unsubscribe_from_email(self, message_id: str, headers: Dict[str, str] = None) -> bool:
         """Attempt to unsubscribe from email"""
         raise NotImplementedError
 
@@ -61,10 +138,15 @@ class GmailProvider(EmailProvider):
 
     def authenticate(self) -> bool:
         """Authenticate with Gmail API using OAuth 2.0."""
+        cached = _CREDS_CACHE.get(GMAIL_TOKEN_PATH)
+        if cached and cached[0] == _mtime(GMAIL_TOKEN_PATH) and cached[1].valid:
+            self.service = cached[2]
+            return True
+
         creds = None
 
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', GMAIL_SCOPES)
+        if os.path.exists(GMAIL_TOKEN_PATH):
+            creds = Credentials.from_authorized_user_file(GMAIL_TOKEN_PATH, GMAIL_SCOPES)
 
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
@@ -77,84 +159,109 @@ class GmailProvider(EmailProvider):
                     'credentials.json', GMAIL_SCOPES)
                 creds = flow.run_local_server(port=0)
 
-            with open('token.json', 'w') as token:
+            with open(GMAIL_TOKEN_PATH, 'w') as token:
                 token.write(creds.to_json())
 
         try:
-            self.service = build('gmail', 'v1', credentials=creds)
+            # The discovery document bundled with the client library avoids fetching it
+            self.service = build('gmail', 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
+            _CREDS_CACHE[GMAIL_TOKEN_PATH] = (_mtime(GMAIL_TOKEN_PATH), creds, self.service)
             return True
         except Exception:
             return False
 
+    def is_authenticated(self) -> bool:
+        """Whether the Gmail service is built; its credentials refresh themselves."""
+        return self.service is not None
+
     def fetch_unread_emails(self, count: int = 10) -> List[Dict]:
         """Fetch unread email IDs from Gmail."""
         try:
             results = self.service.users().messages().list(
                 userId='me',
                 q='is:unread',
-                maxResults=count
+                maxResults=count,
+                fields=GMAIL_LIST_FIELDS
             ).execute()
 
-            messages = results.get('messages', [])
-            email_details = []
-
-            for msg in messages:
-                details = self.get_email_details(msg['id'])
-                if details:
-                    email_details.append(details)
-
-            return email_details
+            message_ids = [msg['id'] for msg in results.get('messages', [])]
+            return self.get_email_details_batch(message_ids)
 
         except HttpError:
             return []
 
+    def get_email_details_batch(self, message_ids: List[str]) -> List[Dict]:
+        """Get details for several emails through Gmail batch requests, in input order."""
+        details = {}
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                details[request_id] = self._parse_message(request_id, response)
+
+        for start in range(0, len(message_ids), GMAIL_BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for message_id in message_ids[start:start + GMAIL_BATCH_LIMIT]:
+                batch.add(
+                    self.service.users().messages().get(
+                        userId='me', id=message_id, format='full', fields=GMAIL_MESSAGE_FIELDS
+                    ),
+                    request_id=message_id
+                )
+            batch.execute()
+
+        return [details[message_id] for message_id in message_ids if message_id in details]
+
     def get_email_details(self, message_id: str) -> Optional[Dict[str, str]]:
         """Get detailed information about a specific email."""
         try:
             message = self.service.users().messages().get(
                 userId='me',
                 id=message_id,
-                format='full'
+                format='full',
+                fields=GMAIL_MESSAGE_FIELDS
             ).execute()
 
-            headers = message['payload'].get('headers', [])
-
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-
-            body = self._extract_email_body(message['payload'])
-
-            return {
-                'id': message_id,
-                'sender': sender,
-                'subject': subject,
-                'body': body,
-                'headers': headers,
-                'provider': 'gmail'
-            }
+            return self._parse_message(message_id, message)
 
         except HttpError:
             return None
 
+    def _parse_message(self, message_id: str, message: Dict) -> Dict[str, str]:
+        """Build the email details dict from a messages.get response."""
+        # Built once per message; the same dict is stored as the email's headers
+        hdrs = _index_headers(message['payload'].get('headers', []))
+
+        sender = hdrs.get('from', 'Unknown')
+        subject = hdrs.get('subject', 'No Subject')
+
+        body = self._extract_email_body(message['payload'])
+
+        return {
+            'id': message_id,
+            'thread_id': message.get('threadId'),
+            'internal_date': message.get('internalDate'),
+            'sender': sender,
+            'subject': subject,
+            'body': body,
+            'headers': hdrs,
+            'provider': 'gmail'
+        }
+
     def _extract_email_body(self, payload: Dict) -> str:
         """Extract plain text body from email payload."""
-        body = ""
-
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body']['data']
-                    body = base64.urlsafe_b64decode(data).decode('utf-8')
-                    break
-                elif part['mimeType'] == 'multipart/alternative':
-                    body = self._extract_email_body(part)
-                    if body:
-                        break
-        elif payload['mimeType'] == 'text/plain':
-            data = payload['body']['data']
-            body = base64.urlsafe_b64decode(data).decode('utf-8')
-
-        return body[:2000]  # Limit body length for AI processing
+        # Depth-first walk of the MIME tree in document order, stopping at the first
+        # non-empty text/plain part; only the prefix that survives the cut is decoded
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            data = part.get('body', {}).get('data')
+            if part.get('mimeType') == 'text/plain' and data:
+                data = data[:_BODY_B64_CHARS]
+                data += '=' * (-len(data) % 4)
+                return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')[:BODY_LIMIT]
+            stack.extend(reversed(part.get('parts', [])))
+
+        return ""
 
     def delete_email(self, message_id: str) -> bool:
         """Move email to trash."""
@@ -164,25 +271,40 @@ class GmailProvider(EmailProvider):
         except HttpError:
             return False
 
-    def unsubscribe_from_email(self, message_id: str, headers: List[Dict] = None) -> bool:
+    def delete_emails(self, message_ids: List[str]) -> List[bool]:
+        """Move several emails to trash with one batchModify call per 1000 ids."""
+        results = []
+        for start in range(0, len(message_ids), GMAIL_MODIFY_LIMIT):
+            chunk = message_ids[start:start + GMAIL_MODIFY_LIMIT]
+            try:
+                self.service.users().messages().batchModify(
+                    userId='me',
+                    body={'ids': chunk, 'addLabelIds': ['TRASH']}
+                ).execute()
+                results.extend([True] * len(chunk))
+            except HttpError:
+                results.extend([False] * len(chunk))
+        return results
+
+    def unsubscribe_from_email(self, message_id: str, headers: Dict[str, str] = None) -> bool:
         """Attempt to unsubscribe from email using List-Unsubscribe header."""
         try:
+            # Only the List-Unsubscribe header is needed, not the message body
             message = self.service.users().messages().get(
                 userId='me',
                 id=message_id,
-                format='full'
+                format='metadata',
+                metadataHeaders=[LIST_UNSUBSCRIBE],
+                fields='payload/headers'
             ).execute()
 
-            headers = message['payload'].get('headers', [])
-            unsubscribe_header = next(
-                (h['value'] for h in headers if h['name'] == 'List-Unsubscribe'),
-                None
-            )
+            hdrs = _index_headers(message['payload'].get('headers', []))
+            unsubscribe_header = hdrs.get(_LIST_UNSUBSCRIBE_KEY)
 
             if not unsubscribe_header:
                 return False
 
-            mailto_match = re.search(r'<mailto:([^>]+)>', unsubscribe_header)
+            mailto_match = _MAILTO_RE.search(unsubscribe_header)
             if mailto_match:
                 unsubscribe_email = mailto_match.group(1)
 
@@ -232,6 +354,18 @@ class OutlookProvider(EmailProvider):
 
     def __init__(self):
         self.access_token = None
+        self.token_expires = 0.0
+        self.session = _graph_session()
+
+    def _set_token(self, result: Dict) -> None:
+        """Remember the access token from an MSAL result and send it with every Graph request."""
+        self.access_token = result['access_token']
+        self.token_expires = time.time() + result.get('expires_in', 0) - TOKEN_EXPIRY_MARGIN
+        self.session.headers['Authorization'] = f'Bearer {self.access_token}'
+
+    def is_authenticated(self) -> bool:
+        """Whether the access token is set and not about to expire."""
+        return self.access_token is not None and time.time() < self.token_expires
 
     def authenticate(self) -> bool:
         """Authenticate with Microsoft Graph API using MSAL."""
@@ -251,7 +385,7 @@ class OutlookProvider(EmailProvider):
         if accounts:
             result = app.acquire_token_silent(OUTLOOK_SCOPES, account=accounts[0])
             if result and 'access_token' in result:
-                self.access_token = result['access_token']
+                self._set_token(result)
                 return True
 
         # Interactive authentication
@@ -261,87 +395,104 @@ class OutlookProvider(EmailProvider):
         )
 
         if 'access_token' in result:
-            self.access_token = result['access_token']
+            self._set_token(result)
             return True
 
         return False
 
     def fetch_unread_emails(self, count: int = 10) -> List[Dict]:
         """Fetch unread emails from Outlook using Microsoft Graph API."""
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
-        }
-
-        url = f'https://graph.microsoft.com/v1.0/me/messages?$filter=isRead eq false&$top={count}&$select=id,sender,subject,body,internetMessageHeaders'
+        url = f'https://graph.microsoft.com/v1.0/me/messages?$filter=isRead eq false&$top={count}&$select={GRAPH_MESSAGE_SELECT}'
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=GRAPH_TEXT_HEADERS)
             response.raise_for_status()
 
             data = response.json()
-            emails = []
-
-            for message in data.get('value', []):
-                email_data = {
-                    'id': message['id'],
-                    'sender': message['sender']['emailAddress']['address'],
-                    'subject': message.get('subject', 'No Subject'),
-                    'body': message['body']['content'][:2000] if message['body']['content'] else '',
-                    'headers': message.get('internetMessageHeaders', []),
-                    'provider': 'outlook'
-                }
-                emails.append(email_data)
-
-            return emails
+            return [self._parse_message(message['id'], message) for message in data.get('value', [])]
 
         except requests.RequestException:
             return []
 
     def get_email_details(self, message_id: str) -> Optional[Dict[str, str]]:
         """Get detailed information about a specific Outlook email."""
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
-        }
-
-        url = f'https://graph.microsoft.com/v1.0/me/messages/{message_id}?$select=id,sender,subject,body,internetMessageHeaders'
+        url = f'https://graph.microsoft.com/v1.0/me/messages/{message_id}?$select={GRAPH_MESSAGE_SELECT}'
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=GRAPH_TEXT_HEADERS)
             response.raise_for_status()
 
-            message = response.json()
-
-            return {
-                'id': message_id,
-                'sender': message['sender']['emailAddress']['address'],
-                'subject': message.get('subject', 'No Subject'),
-                'body': message['body']['content'][:2000] if message['body']['content'] else '',
-                'headers': message.get('internetMessageHeaders', []),
-                'provider': 'outlook'
-            }
+            return self._parse_message(message_id, response.json())
 
         except requests.RequestException:
             return None
 
-    def delete_email(self, message_id: str) -> bool:
-        """Move Outlook email to trash."""
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
+    def get_email_details_batch(self, message_ids: List[str]) -> List[Dict]:
+        """Get details for several Outlook emails through Graph $batch requests, in input order."""
+        responses = self._graph_batch([
+            {'method': 'GET', 'url': f'/me/messages/{message_id}?$select={GRAPH_MESSAGE_SELECT}',
+             'headers': GRAPH_TEXT_HEADERS}
+            for message_id in message_ids
+        ])
+        return [
+            self._parse_message(message_id, response['body'])
+            for message_id, response in zip(message_ids, responses)
+            if response and 200 <= response.get('status', 0) < 300 and response.get('body')
+        ]
+
+    def _parse_message(self, message_id: str, message: Dict) -> Dict[str, str]:
+        """Build the email details dict from a Graph message resource."""
+        return {
+            'id': message_id,
+            'thread_id': message.get('conversationId'),
+            'sender': message['sender']['emailAddress']['address'],
+            'subject': message.get('subject', 'No Subject'),
+            'body': message['body']['content'][:BODY_LIMIT] if message['body']['content'] else '',
+            'headers': _index_headers(message.get('internetMessageHeaders', [])),
+            'provider': 'outlook'
         }
 
+    def _graph_batch(self, subrequests: List[Dict]) -> List[Optional[Dict]]:
+        """Send Graph subrequests 20 per $batch request, with up to GRAPH_CONCURRENCY
+        batches in flight at once; returns each subrequest's response (None if its
+        batch failed), in input order."""
+        chunks = [subrequests[i:i + GRAPH_BATCH_LIMIT] for i in range(0, len(subrequests), GRAPH_BATCH_LIMIT)]
+
+        def send(chunk: List[Dict]) -> List[Optional[Dict]]:
+            try:
+                response = self.session.post(GRAPH_BATCH_URL, json={'requests': [
+                    dict(subrequest, id=str(n)) for n, subrequest in enumerate(chunk)
+                ]})
+                response.raise_for_status()
+                by_id = {r['id']: r for r in response.json().get('responses', [])}
+            except (requests.RequestException, ValueError):
+                by_id = {}
+            return [by_id.get(str(n)) for n in range(len(chunk))]
+
+        if len(chunks) <= 1:
+            return [r for chunk in chunks for r in send(chunk)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=GRAPH_CONCURRENCY) as executor:
+            return [r for results in executor.map(send, chunks) for r in results]
+
+    def delete_email(self, message_id: str) -> bool:
+        """Move Outlook email to trash."""
         url = f'https://graph.microsoft.com/v1.0/me/messages/{message_id}'
 
         try:
-            response = requests.delete(url, headers=headers)
+            response = self.session.delete(url)
             response.raise_for_status()
             return True
         except requests.RequestException:
             return False
 
-    def unsubscribe_from_email(self, message_id: str, headers: List[Dict] = None) -> bool:
+    def delete_emails(self, message_ids: List[str]) -> List[bool]:
+        """Move several Outlook emails to trash, 20 per Graph $batch request."""
+        responses = self._graph_batch([
+            {'method': 'DELETE', 'url': f'/me/messages/{message_id}'} for message_id in message_ids
+        ])
+        return [bool(response) and 200 <= response.get('status', 0) < 300 for response in responses]
+
+    def unsubscribe_from_email(self, message_id: str, headers: Dict[str, str] = None) -> bool:
         """Attempt to unsubscribe from Outlook email using List-Unsubscribe header."""
         if not headers:
             email_details = self.get_email_details(message_id)
@@ -349,16 +500,15 @@ class OutlookProvider(EmailProvider):
                 return False
             headers = email_details['headers']
 
-        unsubscribe_header = None
-        for header in headers:
-            if header.get('name', '').lower() == 'list-unsubscribe':
-                unsubscribe_header = header.get('value')
-                break
+        # Fetched headers are keyed by lowercased name; ones passed in may not be
+        unsubscribe_header = headers.get(_LIST_UNSUBSCRIBE_KEY)
+        if unsubscribe_header is None:
+            unsubscribe_header = {name.lower(): value for name, value in headers.items()}.get(_LIST_UNSUBSCRIBE_KEY)
 
         if not unsubscribe_header:
             return False
 
-        mailto_match = re.search(r'<mailto:([^>]+)>', unsubscribe_header)
+        mailto_match = _MAILTO_RE.search(unsubscribe_header)
         if mailto_match:
             unsubscribe_email = mailto_match.group(1)
             return self.send_email(unsubscribe_email, "Unsubscribe", "")
@@ -384,15 +534,9 @@ class OutlookProvider(EmailProvider):
             }
         }
 
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
-        }
-
         try:
-            response = requests.post(
+            response = self.session.post(
                 'https://graph.microsoft.com/v1.0/me/sendMail',
-                headers=headers,
                 json=email_data
             )
             response.raise_for_status()
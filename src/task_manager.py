@@ -4,7 +4,7 @@ Task management system for email-derived tasks
 
 import os
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 
 class TaskManager:
@@ -12,26 +12,69 @@ class TaskManager:
 
     def __init__(self, tasks_file: str = "tasks.md"):
         self.tasks_file = tasks_file
+        # Parsed tasks with the (mtime, size) of the file they were read from
+        self._cache: Optional[Tuple[Tuple[int, int], List[Dict]]] = None
 
     def create_task(self, task_description: str, sender: str, email_subject: str = "", priority: str = "Medium") -> bool:
         """Create a task from an email."""
         try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-            priority_marker = self._get_priority_marker(priority)
+            task_entry = self._format_task_entry(task_description, sender, email_subject, priority)
+            return self._append(task_entry)
 
-            task_entry = f"- [ ] {priority_marker} {task_description}\n"
-            task_entry += f"  - From: {sender}\n"
-            if email_subject:
-                task_entry += f"  - Re: {email_subject}\n"
-            task_entry += f"  - Created: {timestamp}\n\n"
+        except Exception:
+            return False
 
+    def _append(self, content: str) -> bool:
+        """Append entries to the tasks file with a single open and write."""
+        try:
             with open(self.tasks_file, 'a', encoding='utf-8') as f:
-                f.write(task_entry)
+                f.write(content)
+        except Exception:
+            return False
+        self._cache = None
+        return True
 
-            return True
+    def create_tasks_bulk(self, tasks: List[Dict]) -> List[bool]:
+        """Create several tasks with a single write to the tasks file.
+
+        Each task dict takes the same keys as create_task's arguments:
+        task_description, sender, and optionally email_subject and priority.
+        """
+        if not tasks:
+            return []
+
+        try:
+            # One timestamp for the whole batch; the entries are created together
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            content = "".join(
+                self._format_task_entry(
+                    task['task_description'],
+                    task['sender'],
+                    task.get('email_subject', ''),
+                    task.get('priority', 'Medium'),
+                    timestamp
+                )
+                for task in tasks
+            )
+
+            return [self._append(content)] * len(tasks)
 
         except Exception:
-            return False
+            return [False] * len(tasks)
+
+    def _format_task_entry(self, task_description: str, sender: str, email_subject: str = "",
+                           priority: str = "Medium", timestamp: Optional[str] = None) -> str:
+        """Format a task and its metadata as a markdown checklist entry."""
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        priority_marker = self._get_priority_marker(priority)
+
+        lines = [f"- [ ] {priority_marker} {task_description}\n", f"  - From: {sender}\n"]
+        if email_subject:
+            lines.append(f"  - Re: {email_subject}\n")
+        lines.append(f"  - Created: {timestamp}\n\n")
+
+        return "".join(lines)
 
     def create_calendar_event(self, event_details: Dict) -> bool:
         """Create a calendar event from email (placeholder for future implementation)."""
@@ -49,46 +92,53 @@ class TaskManager:
         )
 
     def get_tasks(self) -> List[Dict]:
-        """Get all tasks from the tasks file."""
-        if not os.path.exists(self.tasks_file):
+        """Get all tasks from the tasks file (re-parsed only when the file changes)."""
+        try:
+            stat = os.stat(self.tasks_file)
+        except OSError:
             return []
 
+        version = (stat.st_mtime_ns, stat.st_size)
+        if self._cache is not None and self._cache[0] == version:
+            return list(self._cache[1])
+
         tasks = []
         try:
-            with open(self.tasks_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # Simple parsing - could be enhanced with more sophisticated markdown parsing
-            lines = content.split('\n')
+            # Simple parsing - could be enhanced with more sophisticated markdown parsing.
+            # The file is streamed line by line rather than read whole.
             current_task = None
 
-            for line in lines:
-                if line.startswith('- [ ]') or line.startswith('- [x]'):
-                    if current_task:
-                        tasks.append(current_task)
-
-                    completed = '[x]' in line
-                    task_text = line[5:].strip()  # Remove "- [ ] " or "- [x] "
-
-                    current_task = {
-                        'text': task_text,
-                        'completed': completed,
-                        'metadata': {}
-                    }
-                elif line.strip().startswith('- ') and current_task:
-                    # Metadata line
-                    meta_text = line.strip()[2:]  # Remove "- "
-                    if ':' in meta_text:
-                        key, value = meta_text.split(':', 1)
-                        current_task['metadata'][key.strip()] = value.strip()
+            with open(self.tasks_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.rstrip('\n')
+                    if line.startswith('- [ ]') or line.startswith('- [x]'):
+                        if current_task:
+                            tasks.append(current_task)
+
+                        completed = '[x]' in line
+                        task_text = line[5:].strip()  # Remove "- [ ] " or "- [x] "
+
+                        current_task = {
+                            'text': task_text,
+                            'completed': completed,
+                            'metadata': {}
+                        }
+                    elif line.strip().startswith('- ') and current_task:
+                        # Metadata line
+                        meta_text = line.strip()[2:]  # Remove "- "
+                        if ':' in meta_text:
+                            key, value = meta_text.split(':', 1)
+                            current_task['metadata'][key.strip()] = value.strip()
 
             if current_task:
                 tasks.append(current_task)
 
         except Exception:
             pass
+        else:
+            self._cache = (version, tasks)
 
-        return tasks
+        return list(tasks)
 
     def _get_priority_marker(self, priority: str) -> str:
         """Get priority marker for tasks."""
@@ -3,35 +3,88 @@ Thread analysis and context management for email conversations
 """
 
 import re
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from email.utils import parsedate_to_datetime
+
+# Characters stripped from message ids, compiled once; only needed for ids that
+# contain whitespace (see _normalize_message_id)
+_MSGID_STRIP = re.compile(r'[<>\s]')
+# Reply and forward prefixes stripped from (lowercased) subjects
+_SUBJECT_PREFIXES = ('re:', 'fwd:', 'fw:')
+
+# Keyword sets matched as one alternation each, so a body is scanned once per set
+# rather than once per keyword; like the substring tests they replace, they also
+# match inside longer words
+_URGENCY_RE = re.compile(r'urgent|asap|immediate|deadline|emergency', re.IGNORECASE)
+_ACTION_RE = re.compile(r'please|can you|need to|should we', re.IGNORECASE)
+# Reply cues besides a question mark, which comes from the per-email question count
+_REPLY_CUE_RE = re.compile(r'please|can you|what do you think', re.IGNORECASE)
+_SCHEDULING_RE = re.compile(r'meeting|schedule|calendar', re.IGNORECASE)
 
 
 class ThreadAnalyzer:
     """Analyze email threads and provide conversation context"""
 
     def __init__(self):
+        # id(emails) -> (emails, their count, thread index, threads) for the last
+        # email list indexed by build_thread_index
         self.thread_cache = {}
+        # analyze_thread_patterns results by the ordered ids of the emails analyzed
+        self.pattern_cache: Dict[tuple, Dict] = {}
+
+    def _headers_map(self, email: Dict) -> Dict[str, str]:
+        """Return the email's headers as a dict keyed by lowercased header name.
+
+        Headers are normally a name -> value dict; the raw provider list of
+        ``{'name': ..., 'value': ...}`` entries is accepted as well. The map is
+        built once per email and stored on it as '_hdrs'.
+        """
+        hdrs = email.get('_hdrs')
+        if hdrs is None:
+            headers = email.get('headers') or {}
+            if isinstance(headers, dict):
+                hdrs = {name.lower(): value for name, value in headers.items()}
+            else:
+                hdrs = {h.get('name', '').lower(): h.get('value', '') for h in headers}
+            email['_hdrs'] = hdrs
+        return hdrs
+
+    def _question_count(self, email: Dict) -> int:
+        """Count the question marks in an email's body (once per email, stored on it as
+        '_questions')"""
+        count = email.get('_questions')
+        if count is None:
+            count = email['_questions'] = email.get('body', '').count('?')
+        return count
 
     def extract_thread_id(self, email: Dict) -> str:
-        """Extract a thread identifier from email headers"""
-        headers = email.get('headers', [])
+        """Extract a thread identifier from email headers (computed once per email and
+        stored on it as '_thread_id')"""
+        thread_id = email.get('_thread_id')
+        if thread_id is None:
+            thread_id = email['_thread_id'] = self._derive_thread_id(email)
+        return thread_id
+
+    def _derive_thread_id(self, email: Dict) -> str:
+        """Work out the thread identifier of an email"""
+        # The provider's own conversation id (Gmail threadId, Outlook conversationId)
+        # groups whole threads, which the header chain below only approximates
+        if email.get('thread_id'):
+            return email['thread_id']
+
+        headers = self._headers_map(email)
 
         # Look for standard threading headers
-        in_reply_to = None
-        references = None
-        message_id = None
-
-        for header in headers:
-            name = header.get('name', '').lower()
-            value = header.get('value', '')
+        message_id = headers.get('message-id')
+        in_reply_to = headers.get('in-reply-to')
+        references = headers.get('references')
 
-            if name == 'message-id':
-                message_id = self._normalize_message_id(value)
-            elif name == 'in-reply-to':
-                in_reply_to = self._normalize_message_id(value)
-            elif name == 'references':
-                references = value
+        if message_id:
+            message_id = self._normalize_message_id(message_id)
+        if in_reply_to:
+            in_reply_to = self._normalize_message_id(in_reply_to)
 
         # Use In-Reply-To header for threading (best for grouping)
         if in_reply_to:
@@ -51,97 +104,179 @@ class ThreadAnalyzer:
         subject = email.get('subject', '')
         normalized_subject = self._normalize_subject(subject)
 
-        return f"subject-{hash(normalized_subject)}"
+        # crc32 rather than hash(), which is salted per process, so ids are stable across runs
+        return f"subject-{zlib.crc32(normalized_subject.encode('utf-8')):08x}"
 
     def _normalize_message_id(self, message_id: str) -> str:
         """Normalize message ID for threading"""
-        # Remove angle brackets and whitespace
-        return re.sub(r'[<>\s]', '', message_id)
+        # Remove angle brackets and whitespace. Ids rarely contain whitespace, and an
+        # id with no space that is printable has none (isprintable() is False for
+        # every other whitespace character), so two replace() calls do
+        normalized = message_id.replace('<', '').replace('>', '')
+        if ' ' in normalized or not normalized.isprintable():
+            normalized = _MSGID_STRIP.sub('', normalized)
+        return normalized
 
     def _normalize_subject(self, subject: str) -> str:
         """Normalize subject for threading"""
-        # Remove Re:, Fwd:, etc.
-        normalized = re.sub(r'^(re|fwd|fw):\s*', '', subject.lower(), flags=re.IGNORECASE)
+        normalized = subject.lower()
+        # Remove Re:, Fwd:, etc.; most subjects have no prefix, and startswith
+        # rules that out without running a regex
+        if normalized.startswith(_SUBJECT_PREFIXES):
+            normalized = normalized.split(':', 1)[1]
         # Remove extra whitespace
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        return normalized
+        return ' '.join(normalized.split())
 
     def group_emails_by_thread(self, emails: List[Dict]) -> Dict[str, List[Dict]]:
         """Group emails into conversation threads"""
-        threads = {}
+        threads = defaultdict(list)
 
         for email in emails:
-            thread_id = self.extract_thread_id(email)
-
-            if thread_id not in threads:
-                threads[thread_id] = []
-
-            threads[thread_id].append(email)
-
-        # Sort emails within each thread by date if available
-        for thread_id, thread_emails in threads.items():
-            thread_emails.sort(key=self._get_email_timestamp)
-
-        return threads
-
-    def _get_email_timestamp(self, email: Dict) -> datetime:
-        """Extract timestamp from email for sorting"""
-        headers = email.get('headers', [])
-
-        for header in headers:
-            if header.get('name', '').lower() == 'date':
-                try:
-                    # Parse email date - this is simplified, real implementation
-                    # would need proper RFC 2822 date parsing
-                    date_str = header.get('value', '')
-                    # For now, return current time as fallback
-                    return datetime.now()
-                except:
-                    pass
-
-        return datetime.now()
-
-    def get_thread_context(self, email: Dict, all_emails: List[Dict]) -> List[Dict]:
-        """Get conversation context for an email"""
+            threads[self.extract_thread_id(email)].append(email)
+
+        # Sort emails within each thread by date if available; single-message
+        # threads need no sort
+        for thread_emails in threads.values():
+            if len(thread_emails) > 1:
+                thread_emails.sort(key=self._get_email_timestamp)
+
+        return dict(threads)
+
+    def build_thread_index(self, emails: List[Dict]) -> Tuple[Dict[str, str], Dict[str, List[Dict]]]:
+        """Group emails into threads once and return (email id -> thread id, thread id -> emails).
+
+        The result for the most recent list is cached, so repeated lookups against the
+        same inbox (e.g. get_thread_context for each of its emails) group it only once.
+        """
+        cached = self.thread_cache.get(id(emails))
+        if cached is not None and cached[0] is emails and cached[1] == len(emails):
+            return cached[2], cached[3]
+
+        threads = self.group_emails_by_thread(emails)
+        thread_index = {e.get('id'): thread_id for thread_id, thread_emails in threads.items() for e in thread_emails}
+        self.thread_cache.clear()
+        self.pattern_cache.clear()
+        self.thread_cache[id(emails)] = (emails, len(emails), thread_index, threads)
+        return thread_index, threads
+
+    def remove_from_index(self, email: Dict, thread_index: Dict[str, str], threads: Dict[str, List[Dict]]) -> None:
+        """Drop an email that left the inbox from a build_thread_index result, in place,
+        so it is no longer given as thread context for the rest of its thread"""
+        thread_id = thread_index.pop(email.get('id'), None)
+        if thread_id is None:
+            return
+        members = [e for e in threads.get(thread_id, ()) if e is not email]
+        if members:
+            threads[thread_id] = members
+        else:
+            threads.pop(thread_id, None)
+
+    def _get_email_timestamp(self, email: Dict) -> float:
+        """Extract timestamp from email for sorting (seconds since the epoch, computed
+        once per email and stored on it as '_ts')"""
+        ts = email.get('_ts')
+        if ts is not None:
+            return ts
+
+        # Gmail's internalDate (milliseconds since the epoch) needs no parsing;
+        # otherwise fall back to the RFC 2822 Date header
+        internal_date = email.get('internal_date')
+        if internal_date:
+            ts = int(internal_date) / 1000
+        else:
+            date_str = self._headers_map(email).get('date')
+            try:
+                ts = parsedate_to_datetime(date_str).timestamp() if date_str else 0
+            except (TypeError, ValueError):
+                ts = 0
+
+        email['_ts'] = ts
+        return ts
+
+    def get_thread_context(self,
+                           email: Dict,
+                           all_emails: List[Dict] = None,
+                           thread_index: Dict[str, str] = None,
+                           threads: Dict[str, List[Dict]] = None) -> List[Dict]:
+        """Get conversation context for an email
+
+        If a precomputed ``thread_index`` (email id -> thread id) and ``threads``
+        (thread id -> sorted emails), as returned by build_thread_index, are not
+        given, they are built from all_emails (once per list) and the thread is
+        looked up directly instead of re-scanning all_emails.
+        """
+        if (thread_index is None or threads is None) and all_emails:
+            thread_index, threads = self.build_thread_index(all_emails)
+
+        email_id = email.get('id')
+        if thread_index is not None and threads is not None:
+            # Threads are grouped with the same ids and already sorted, so one
+            # filtering pass over the email's thread gives the context, even for an
+            # email that is not itself indexed
+            thread_id = thread_index.get(email_id) or self.extract_thread_id(email)
+            return [e for e in threads.get(thread_id, []) if e.get('id') != email_id]
+
+        # No emails to index: scan for the thread, leaving out the current email in
+        # the same pass, and sort by timestamp
         thread_id = self.extract_thread_id(email)
-
-        # Find all emails in the same thread
-        thread_emails = []
-        for other_email in all_emails:
-            if self.extract_thread_id(other_email) == thread_id:
-                thread_emails.append(other_email)
-
-        # Sort by timestamp
-        thread_emails.sort(key=self._get_email_timestamp)
-
-        # Return context (excluding the current email)
-        context = [e for e in thread_emails if e.get('id') != email.get('id')]
-
-        return context
+        return sorted(
+            (e for e in all_emails or [] if e.get('id') != email_id and self.extract_thread_id(e) == thread_id),
+            key=self._get_email_timestamp,
+        )
 
     def analyze_thread_patterns(self, thread_emails: List[Dict]) -> Dict:
-        """Analyze patterns in a thread for better AI context"""
+        """Analyze patterns in a thread for better AI context
+
+        Results are memoized by the ordered email ids, so analyzing the same messages
+        again (e.g. from should_draft_reply and then directly) is a dict lookup, and a
+        thread that has grown by one message extends the analysis of the rest of it
+        rather than re-scanning every body. The returned dict is shared and should
+        not be modified.
+        """
         if not thread_emails:
             return {}
 
-        analysis = {
-            'thread_length': len(thread_emails),
-            'participants': set(),
-            'response_pattern': [],
-            'urgency_escalation': False,
-            'question_count': 0,
-            'action_items': []
-        }
-
-        previous_sender = None
-        urgency_keywords = ['urgent', 'asap', 'immediate', 'deadline', 'emergency']
-
-        for i, email in enumerate(thread_emails):
+        key = tuple(e.get('id') or id(e) for e in thread_emails)
+        cached = self.pattern_cache.get(key)
+        if cached is not None:
+            return cached
+
+        previous = self.pattern_cache.get(key[:-1])
+        if previous is not None:
+            # Carry the state over from the analysis of all but the last email
+            start = len(thread_emails) - 1
+            participants = dict.fromkeys(previous['participants'])
+            analysis = {
+                'thread_length': len(thread_emails),
+                'participants': [],
+                'response_pattern': list(previous['response_pattern']),
+                'urgency_escalation': previous['urgency_escalation'],
+                'question_count': previous['question_count'],
+                'action_items': list(previous['action_items'])
+            }
+            previous_sender = thread_emails[start - 1].get('sender', '')
+        else:
+            start = 0
+            # Insertion-ordered, so participants are listed in order of first appearance
+            participants = {}
+            analysis = {
+                'thread_length': len(thread_emails),
+                'participants': [],
+                'response_pattern': [],
+                'urgency_escalation': False,
+                'question_count': 0,
+                'action_items': []
+            }
+            previous_sender = None
+
+        for i in range(start, len(thread_emails)):
+            email = thread_emails[i]
             sender = email.get('sender', '')
-            body = email.get('body', '').lower()
-            subject = email.get('subject', '').lower()
+            # The keyword patterns ignore case, so no lowercased copies are needed
+            body = email.get('body', '')
+            subject = email.get('subject', '')
 
-            analysis['participants'].add(sender)
+            participants[sender] = None
 
             # Track response pattern (back and forth vs one-sided)
             if previous_sender and previous_sender != sender:
@@ -150,21 +285,22 @@ class ThreadAnalyzer:
                 analysis['response_pattern'].append('continuation')
 
             # Check for urgency escalation
-            if any(keyword in body or keyword in subject for keyword in urgency_keywords):
+            if _URGENCY_RE.search(body) or _URGENCY_RE.search(subject):
                 if i > 0:  # Not the first email
                     analysis['urgency_escalation'] = True
 
             # Count questions
-            analysis['question_count'] += body.count('?')
+            analysis['question_count'] += self._question_count(email)
 
             # Look for action items (simplified)
-            if any(phrase in body for phrase in ['please', 'can you', 'need to', 'should we']):
+            if _ACTION_RE.search(body):
                 analysis['action_items'].append(f"Email {i+1}: Action requested")
 
             previous_sender = sender
 
-        analysis['participants'] = list(analysis['participants'])
+        analysis['participants'] = list(participants)
 
+        self.pattern_cache[key] = analysis
         return analysis
 
     def get_conversation_summary(self, thread_emails: List[Dict]) -> str:
@@ -197,7 +333,16 @@ class ThreadAnalyzer:
 
     def should_draft_reply(self, email: Dict, thread_context: List[Dict]) -> Dict:
         """Determine if and how to draft a reply based on thread context"""
-        thread_analysis = self.analyze_thread_patterns(thread_context + [email])
+        if thread_context:
+            thread_analysis = self.analyze_thread_patterns(thread_context + [email])
+        else:
+            # A lone message cannot escalate and is one email long, so its questions
+            # are all that is needed from a full analysis
+            thread_analysis = {
+                'thread_length': 1,
+                'urgency_escalation': False,
+                'question_count': self._question_count(email)
+            }
 
         recommendations = {
             'should_reply': False,
@@ -207,11 +352,10 @@ class ThreadAnalyzer:
         }
 
         # Check if this appears to be addressed to the user
-        body = email.get('body', '').lower()
-        subject = email.get('subject', '').lower()
+        body = email.get('body', '')
 
         # Simple heuristics for reply recommendation
-        if any(indicator in body for indicator in ['?', 'please', 'can you', 'what do you think']):
+        if self._question_count(email) or _REPLY_CUE_RE.search(body):
             recommendations['should_reply'] = True
             recommendations['confidence'] = 0.8
 
@@ -222,7 +366,7 @@ class ThreadAnalyzer:
         # Determine reply type based on thread length
         if thread_analysis.get('thread_length', 0) > 5:
             recommendations['reply_type'] = 'summary'  # Suggest summarizing the thread
-        elif any(word in body for word in ['meeting', 'schedule', 'calendar']):
+        elif _SCHEDULING_RE.search(body):
             recommendations['reply_type'] = 'scheduling'
         elif thread_analysis.get('question_count', 0) > 2:
             recommendations['reply_type'] = 'detailed_response'
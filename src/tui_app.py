@@ -2,55 +2,57 @@
 TUI application using textual for enhanced email management
 """
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional
 import asyncio
 
 from textual.app import App, ComposeResult
 from textual.containers import Container, Horizontal, Vertical
+# textual.widgets loads each widget's module on first access, so only the widgets
+# used here are named
 from textual.widgets import (
-    Header, Footer, Static, ListView, ListItem, Label, Button,
-    Input, TextArea, Select, ProgressBar, Tabs, TabPane
+    Header, Footer, Static, ListView, ListItem, Label, Button, TextArea, ProgressBar
 )
 from textual.reactive import reactive
-from textual.message import Message
 from textual.binding import Binding
 from textual.screen import ModalScreen
-from rich.text import Text
-from rich.panel import Panel
 
 from .email_providers import get_provider, EmailProvider
-from .ai_analyzer import AIAnalyzer
+from .ai_analyzer import AIAnalyzer, BATCH_CONCURRENCY
 from .task_manager import TaskManager
 
 
 class EmailItem(ListItem):
     """Custom list item for displaying emails"""
 
+    # Priority and category indicators
+    _PRIORITY_MARKER = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}
+    _CATEGORY_COLORS = {
+        'Important': 'red',
+        'Newsletter': 'blue',
+        'Promotion': 'magenta',
+        'Transactional': 'green',
+        'Spam': 'bright_red',
+        'TaskRequest': 'yellow'
+    }
+
     def __init__(self, email_data: Dict, analysis: Dict = None):
         super().__init__()
         self.email_data = email_data
         self.analysis = analysis
 
-    def compose(self) -> ComposeResult:
-        category = self.analysis.get('category', 'Unknown') if self.analysis else 'Unknown'
-        priority = self.analysis.get('priority', 'Medium') if self.analysis else 'Medium'
+        # The label is formatted once here rather than each time the item is composed
+        category = analysis.get('category', 'Unknown') if analysis else 'Unknown'
+        priority = analysis.get('priority', 'Medium') if analysis else 'Medium'
+        priority_marker = self._PRIORITY_MARKER.get(priority, "🟡")
 
-        # Priority and category indicators
-        priority_marker = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}.get(priority, "🟡")
-        category_colors = {
-            'Important': 'red',
-            'Newsletter': 'blue',
-            'Promotion': 'magenta',
-            'Transactional': 'green',
-            'Spam': 'bright_red',
-            'TaskRequest': 'yellow'
-        }
+        sender = email_data.get('sender', 'Unknown')[:30]
+        subject = email_data.get('subject', 'No Subject')[:50]
 
-        sender = self.email_data.get('sender', 'Unknown')[:30]
-        subject = self.email_data.get('subject', 'No Subject')[:50]
+        self._label_text = f"{priority_marker} {sender:<30} | {subject}"
+        self._label_classes = f"email-item category-{category.lower()}"
 
-        label_text = f"{priority_marker} {sender:<30} | {subject}"
-        yield Label(label_text, classes=f"email-item category-{category.lower()}")
+    def compose(self) -> ComposeResult:
+        yield Label(self._label_text, classes=self._label_classes)
 
 
 class DraftModal(ModalScreen):
@@ -215,8 +217,13 @@ class MailctlTUI(App):
         self.provider_name = provider_name
         self.provider: Optional[EmailProvider] = None
         self.ai_analyzer = AIAnalyzer()
+        # The analyzer's own ThreadAnalyzer, so its per-email and per-thread caches are shared
+        self.thread_analyzer = self.ai_analyzer.thread_analyzer
         self.task_manager = TaskManager()
         self.emails: List[Dict] = []
+        # Thread grouping of self.emails (email id -> thread id, thread id -> emails)
+        self.thread_index: Dict[str, str] = {}
+        self.threads: Dict[str, List[Dict]] = {}
         self.current_email_index = 0
 
     def compose(self) -> ComposeResult:
@@ -249,13 +256,16 @@ class MailctlTUI(App):
     async def authenticate_and_load(self) -> None:
         """Authenticate with email provider and load emails"""
         try:
-            self.provider = get_provider(self.provider_name)
+            # The provider is created once and only re-authenticates when its
+            # credentials are missing or expired, so a refresh goes straight to fetching
+            if self.provider is None:
+                self.provider = get_provider(self.provider_name)
 
             # Show loading
             progress = self.query_one("#load-progress", ProgressBar)
             progress.update(progress=25)
 
-            if not self.provider.authenticate():
+            if not self.provider.is_authenticated() and not self.provider.authenticate():
                 self.notify("Authentication failed!", severity="error")
                 return
 
@@ -282,23 +292,38 @@ class MailctlTUI(App):
 
     async def analyze_emails(self) -> None:
         """Analyze emails with AI and thread context"""
-        for i, email in enumerate(self.emails):
-            try:
-                # Use enhanced analysis with thread context
-                analysis = self.ai_analyzer.analyze_email_with_context(email, self.emails)
-                email['analysis'] = analysis
-            except Exception:
-                email['analysis'] = self.ai_analyzer._fallback_analysis()
+        # Group threads once for the whole inbox instead of once per email
+        self.thread_index, self.threads = self.thread_analyzer.build_thread_index(self.emails)
+        progress = self.query_one("#load-progress", ProgressBar)
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        done = 0
+
+        async def analyze(email: Dict) -> None:
+            nonlocal done
+            # Each Claude call blocks on the network, so it runs in a worker thread and
+            # keeps the UI responsive; a bounded number of them run at once
+            async with semaphore:
+                try:
+                    # Use enhanced analysis with thread context
+                    email['analysis'] = await asyncio.to_thread(
+                        self.ai_analyzer.analyze_email_with_context,
+                        email, self.emails, thread_index=self.thread_index, threads=self.threads
+                    )
+                except Exception:
+                    email['analysis'] = self.ai_analyzer._fallback_analysis()
+            # Analysis fills the 75-100 stretch of the loading bar
+            done += 1
+            progress.update(progress=75 + 25 * done // len(self.emails))
+
+        await asyncio.gather(*(analyze(email) for email in self.emails))
 
     async def populate_email_list(self) -> None:
         """Populate the email list widget"""
         email_list = self.query_one("#email-list", ListView)
-        email_list.clear()
+        await email_list.clear()
 
-        for email in self.emails:
-            analysis = email.get('analysis', {})
-            item = EmailItem(email, analysis)
-            email_list.append(item)
+        # Mount all items in one call, so the list is laid out once rather than per email
+        await email_list.extend(EmailItem(email, email.get('analysis', {})) for email in self.emails)
 
         if self.emails:
             email_list.index = 0
@@ -358,7 +383,9 @@ class MailctlTUI(App):
         draft = self.ai_analyzer.generate_draft_reply(
             current_email,
             all_emails=self.emails,
-            reply_type="auto"  # Let AI determine best reply type
+            reply_type="auto",  # Let AI determine best reply type
+            thread_index=self.thread_index,
+            threads=self.threads
         )
 
         if draft:
@@ -433,10 +460,11 @@ class MailctlTUI(App):
     def remove_current_email(self) -> None:
         """Remove current email from list and update view"""
         if self.emails and 0 <= self.current_email_index < len(self.emails):
-            self.emails.pop(self.current_email_index)
+            removed = self.emails.pop(self.current_email_index)
+            self.thread_analyzer.remove_from_index(removed, self.thread_index, self.threads)
 
             # Update email list display
-            asyncio.create_task(self.populate_email_list())
+            asyncio.create_task(self.remove_email_row(self.current_email_index))
 
             # Adjust current index
             if self.current_email_index >= len(self.emails) and self.emails:
@@ -445,6 +473,13 @@ class MailctlTUI(App):
             if self.emails:
                 asyncio.create_task(self.show_email_preview(self.current_email_index))
 
+    async def remove_email_row(self, index: int) -> None:
+        """Remove one row from the email list widget, instead of rebuilding the list"""
+        email_list = self.query_one("#email-list", ListView)
+        await email_list.pop(index)
+        if self.emails:
+            email_list.index = self.current_email_index
+
     # Keyboard shortcuts
     def action_refresh(self) -> None:
         """Refresh emails"""